@@ -0,0 +1,97 @@
+"""
+Load benchmark of the signature-heavy /authenticate/verify endpoint with and
+without the crypto worker pool (see bionet.crypto).
+
+Starts a guard for each worker count and sends requests from many concurrent
+clients, printing the throughput. Each request recovers the SIWE signature and
+signs a new token, and doesn't touch the registry.
+
+Run from the project directory (the guards need a `.env`):
+
+    python benchmarks/bench_crypto.py [worker counts...]
+"""
+import os
+import sys
+import time
+import asyncio
+import subprocess
+
+import httpx
+from siwe import SiweMessage
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+PORT = 5056
+REQUESTS = 400
+CONCURRENCY = 64
+
+
+def _start(workers: int):
+    env = dict(os.environ, CRYPTO_WORKERS=str(workers))
+    return subprocess.Popen(
+        [sys.executable, "-c", "from bionet.cli import cli; cli()", "guard"]
+        + ["--port", str(PORT)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def _signed_messages(client: httpx.AsyncClient, count: int):
+    messages = []
+    for _ in range(count):
+        account = Account.create()
+        response = await client.post(
+            "/authenticate/request", json={"address": account.address}
+        )
+        raw = SiweMessage(response.json()["message"]).prepare_message()
+        sig = account.sign_message(encode_defunct(text=raw)).signature.hex()
+        messages.append({"message": raw, "signature": sig})
+    return messages
+
+
+async def _measure() -> float:
+    base_url = f"http://localhost:{PORT}"
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        for _ in range(100):
+            try:
+                await client.get("/registry/status")
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+
+        messages = await _signed_messages(client, 16)
+        queue = asyncio.Queue()
+        for i in range(REQUESTS):
+            queue.put_nowait(messages[i % len(messages)])
+
+        async def worker():
+            while not queue.empty():
+                body = queue.get_nowait()
+                response = await client.post("/authenticate/verify", json=body)
+                assert response.status_code == 200
+
+        # warm up, e.g. starting the worker processes
+        await asyncio.gather(*[worker() for _ in range(CONCURRENCY)])
+        for i in range(REQUESTS):
+            queue.put_nowait(messages[i % len(messages)])
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(CONCURRENCY)])
+        return REQUESTS / (time.perf_counter() - start)
+
+
+def main():
+    counts = [int(c) for c in sys.argv[1:]] or [0, 1, 2, 4]
+    print(f"{'workers':<10}{'req/s':>10}")
+    for workers in counts:
+        server = _start(workers)
+        try:
+            print(f"{workers:<10}{asyncio.run(_measure()):>10.0f}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
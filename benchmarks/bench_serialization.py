@@ -0,0 +1,60 @@
+"""
+Per-request serialization cost, before and after encoding once with shared encoders.
+
+token payload : encoding the token payload that gets signed
+response      : building the JSON response body for /authenticate/verify
+
+    python benchmarks/bench_serialization.py
+"""
+import json
+import timeit
+from dataclasses import asdict
+
+from eth_account import Account
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse, Response
+
+from bionet.types import Token, AuthenticationResult, response_encoder
+
+NUMBER = 20000
+
+token = Token.create(Account.create().address, "example.com", 1)
+jwt = "x" * 400
+
+
+def old_payload():
+    return json.dumps(asdict(token), separators=(",", ":"))
+
+
+def new_payload():
+    return token.payload()
+
+
+def old_response():
+    content = AuthenticationResult(address=token.sub, token=jwt).model_dump()
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def new_response():
+    content = {"address": token.sub, "token": jwt, "refresh_token": None}
+    return Response(
+        response_encoder.encode(content), media_type="application/json"
+    ).body
+
+
+def main():
+    assert old_payload() == new_payload()
+    assert old_response() == new_response()
+
+    print(f"{'':<15}{'old us':>10}{'new us':>10}")
+    for name, old, new in [
+        ("token payload", old_payload, new_payload),
+        ("response", old_response, new_response),
+    ]:
+        old_us = timeit.timeit(old, number=NUMBER) / NUMBER * 1e6
+        new_us = timeit.timeit(new, number=NUMBER) / NUMBER * 1e6
+        print(f"{name:<15}{old_us:>10.2f}{new_us:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
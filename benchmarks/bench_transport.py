@@ -0,0 +1,81 @@
+"""
+Compare per-request latency to the guard over TCP and over a unix domain socket.
+
+Starts two guards (`bionet guard --port` and `bionet guard --uds`) and times
+requests to /token/verify with a malformed token. The guard rejects it before any
+crypto or contract call, so the timing is the transport and framework overhead.
+
+Run from the project directory (the guards need a `.env`):
+
+    python benchmarks/bench_transport.py
+"""
+import os
+import sys
+import time
+import tempfile
+import statistics
+import subprocess
+
+import httpx
+
+REQUESTS = 2000
+PORT = 5055
+
+
+def _start(args):
+    return subprocess.Popen(
+        [sys.executable, "-c", "from bionet.cli import cli; cli()", "guard", *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def _wait(client: httpx.Client):
+    for _ in range(100):
+        try:
+            client.get("/token/verify/bad")
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise Exception("guard did not start")
+
+
+def _measure(client: httpx.Client):
+    _wait(client)
+    for _ in range(100):
+        client.get("/token/verify/bad")
+
+    timings = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        client.get("/token/verify/bad")
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return (
+        statistics.mean(timings),
+        timings[len(timings) // 2],
+        timings[-len(timings) // 100],
+    )
+
+
+def main():
+    uds = os.path.join(tempfile.mkdtemp(), "guard.sock")
+    servers = [_start(["--port", str(PORT)]), _start(["--uds", uds])]
+    try:
+        clients = {
+            "tcp": httpx.Client(base_url=f"http://localhost:{PORT}"),
+            "uds": httpx.Client(
+                base_url="http://localhost", transport=httpx.HTTPTransport(uds=uds)
+            ),
+        }
+        print(f"{'transport':<10}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}")
+        for name, client in clients.items():
+            mean, p50, p99 = _measure(client)
+            print(f"{name:<10}{mean:>10.0f}{p50:>10.0f}{p99:>10.0f}")
+    finally:
+        for server in servers:
+            server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,189 @@
 """
-Client API used to talk to service
+Client API used to talk to service, and used by services to talk to the guard
 """
+import time
+from typing import Dict, Tuple
+from datetime import datetime, timezone
+
 import httpx
 from siwe import SiweMessage
 from eth_account import Account
 from eth_account.messages import encode_defunct
 
 from bionet.types import (
+    Token,
     AuthenticationResult,
 )
 
 
-def authenticate(url: str, private_key: str) -> str:
+GUARD_URL = "http://localhost:5000"
+
+
+def guard_client(uds: str = None, base_url: str = GUARD_URL) -> httpx.AsyncClient:
+    """
+    Return a client for talking to the guard from a service.
+
+    Params
+    uds     : path of the guard's unix domain socket. If not set, connects over TCP
+    base_url: the guard's URL. Only the path is used when connecting over the socket
+    """
+    transport = httpx.AsyncHTTPTransport(uds=uds) if uds else None
+    return httpx.AsyncClient(base_url=base_url, transport=transport)
+
+
+def authenticate(
+    url: str, private_key: str, uds: str = None, one_round_trip: bool = False
+) -> str:
     """
     Authenticate to the service at the given URL.
 
     Params
-    url        : The login URL defined by the service
-    private_key: The client's private key used to sign a SIWE message
+    url           : The login URL defined by the service
+    private_key   : The client's private key used to sign a SIWE message
+    uds           : optional unix domain socket to connect to the service over
+    one_round_trip: build the SIWE message locally (see below)
 
     This call makes 2 requests to the guard via the service.  The first call, requests
     a message to sign. The second call, verifies the signature over the message. On success,
     it returns status code 200 and a JWT token to be used as a bearer token on subsequent requests.
 
+    With one_round_trip, the client builds the message from the login parameters
+    published by the service (GET on the login URL). They are cached until they expire,
+    so usually only the signed message is sent.
+
     Otherwise throws an exception
     """
     account = Account.from_key(private_key)
+    transport = httpx.HTTPTransport(uds=uds) if uds else None
+    with httpx.Client(transport=transport) as client:
+        return _login(client, url, account, one_round_trip).token
+
+
+class Session:
+    """
+    Keeps a client authenticated to a service.
+
+    The token is renewed shortly before it expires: with the refresh token when the
+    guard issued one and the service has a refresh URL, otherwise by logging in again.
+
+    session = Session("http://localhost:8080/login", private_key,
+                      refresh_url="http://localhost:8080/refresh")
+    httpx.post("http://localhost:8080/dna", headers={"Bearer": session.token})
+    """
+
+    def __init__(
+        self,
+        url: str,
+        private_key: str,
+        refresh_url: str = None,
+        uds: str = None,
+        leeway: int = 30,
+        one_round_trip: bool = False,
+    ):
+        """
+        Params
+        url           : The login URL defined by the service
+        private_key   : The client's private key used to sign a SIWE message
+        refresh_url   : The refresh URL defined by the service, if any
+        uds           : optional unix domain socket to connect to the service over
+        leeway        : renew the token this many seconds before it expires
+        one_round_trip: log in with a single request, see `authenticate`
+        """
+        self.url = url
+        self.refresh_url = refresh_url
+        self.leeway = leeway
+        self.one_round_trip = one_round_trip
+        self.account = Account.from_key(private_key)
+        transport = httpx.HTTPTransport(uds=uds) if uds else None
+        self.client = httpx.Client(transport=transport)
+        self.result = None
+        self.expires = 0
+
+    @property
+    def token(self) -> str:
+        """
+        A valid token, renewed if needed
+        """
+        if self.result is None:
+            self._login()
+        elif time.time() >= self.expires - self.leeway:
+            self.renew()
+        return self.result.token
+
+    def renew(self):
+        """
+        Get a new token, using the refresh token if possible
+        """
+        if self.result.refresh_token and self.refresh_url:
+            response = self.client.post(
+                self.refresh_url, json={"refresh_token": self.result.refresh_token}
+            )
+            if response.status_code == 200:
+                self._update(AuthenticationResult.from_json(response.json()))
+                return
+        self._login()
+
+    def close(self):
+        self.client.close()
+
+    def _login(self):
+        self._update(_login(self.client, self.url, self.account, self.one_round_trip))
+
+    def _update(self, result: AuthenticationResult):
+        self.result = result
+        self.expires = Token.decode(result.token).exp
+
 
-    response = httpx.post(url, json={"address": account.address})
+# login URL -> (parameters, time they can be used until)
+_login_params: Dict[str, Tuple[Dict, float]] = {}
+
+
+def login_params(client: httpx.Client, url: str, cached: bool = True) -> Dict:
+    """
+    Return the parameters for building a SIWE message for the service,
+    fetched with a GET on the login URL and cached as the response allows
+    """
+    now = time.time()
+    if cached and url in _login_params and _login_params[url][1] > now:
+        return _login_params[url][0]
+
+    response = client.get(url)
+    if response.status_code != 200:
+        raise Exception(
+            f"Error on login parameters request. Status code: {response.status_code}"
+        )
+    params = response.json()
+    _login_params[url] = (params, now + max_age(response))
+    return params
+
+
+def max_age(response: httpx.Response) -> int:
+    """
+    Return the seconds the response may be cached for, from its Cache-Control
+    header. 0 if the header is missing or has no valid max-age
+    """
+    for directive in response.headers.get("cache-control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        if name.lower() == "max-age":
+            try:
+                return max(0, int(value.strip('" ')))
+            except ValueError:
+                return 0
+    return 0
+
+
+def _login(
+    client: httpx.Client, url: str, account, one_round_trip: bool = False
+) -> AuthenticationResult:
+    if one_round_trip:
+        try:
+            return _login_once(client, url, account, login_params(client, url))
+        except Exception:
+            # the cached parameters may be stale, e.g. the guard restarted
+            params = login_params(client, url, cached=False)
+            return _login_once(client, url, account, params)
+
+    response = client.post(url, json={"address": account.address})
     if response.status_code != 200:
         raise Exception(
             f"Error on challenge request. Status code: {response.status_code}"
@@ -39,12 +195,39 @@ def authenticate(url: str, private_key: str) -> str:
     encoded = encode_defunct(text=raw)
     sig = account.sign_message(encoded)
 
-    response = httpx.post(url, json={"message": raw, "signature": sig.signature.hex()})
+    response = client.post(url, json={"message": raw, "signature": sig.signature.hex()})
     if response.status_code != 200:
         raise Exception(
             f"Error on signed message request. Status code: {response.status_code}"
         )
 
-    result = AuthenticationResult.from_json(response.json())
+    return AuthenticationResult.from_json(response.json())
+
+
+def _login_once(
+    client: httpx.Client, url: str, account, params: Dict
+) -> AuthenticationResult:
+    issued = datetime.now(timezone.utc)
+    expires = datetime.fromtimestamp(params["expires"], timezone.utc)
+    siwe_msg = SiweMessage(
+        message={
+            "domain": params["domain"],
+            "address": account.address,
+            "uri": params["uri"],
+            "version": params["version"],
+            "chain_id": params["chain_id"],
+            "nonce": params["nonce"],
+            "issued_at": issued.isoformat("T").replace("+00:00", "Z"),
+            "expiration_time": expires.isoformat("T").replace("+00:00", "Z"),
+        }
+    )
+    raw = siwe_msg.prepare_message()
+    sig = account.sign_message(encode_defunct(text=raw))
+
+    response = client.post(url, json={"message": raw, "signature": sig.signature.hex()})
+    if response.status_code != 200:
+        raise Exception(
+            f"Error on signed message request. Status code: {response.status_code}"
+        )
 
-    return result.token
+    return AuthenticationResult.from_json(response.json())
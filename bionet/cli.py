@@ -1,7 +1,10 @@
-import click
-import uvicorn
+"""
+Command line interface.
 
-from bionet.w3 import deploy_contract, register_user, is_authorized_user, remove_user
+Heavy dependencies (uvicorn, web3) are imported inside the commands that use
+them so each command only pays for what it needs. See tests/test_cli.py.
+"""
+import click
 
 
 @click.group()
@@ -11,9 +14,52 @@ def cli():
 
 @cli.command()
 @click.option("--port", default=5000, help="server port number")
-def guard(port):
+@click.option(
+    "--uds", default=None, help="serve on this unix domain socket instead of a port"
+)
+@click.option(
+    "--uds-mode", default="660", help="file permissions (octal) of the unix socket"
+)
+def guard(port, uds, uds_mode):
     """Start bionet guard server"""
-    uvicorn.run("bionet.server:app", port=port, log_level="info")
+    import uvicorn
+
+    if uds:
+        sock = _bind_unix_socket(uds, int(uds_mode, 8))
+        uvicorn.run("bionet.server:app", fd=sock.fileno(), log_level="info")
+    else:
+        uvicorn.run("bionet.server:app", port=port, log_level="info")
+
+
+def _bind_unix_socket(path: str, mode: int):
+    """
+    Bind the socket ourselves so access can be limited by file permissions.
+    (uvicorn makes the sockets it creates world writable)
+    """
+    import os
+    import stat
+    import socket
+
+    # only replace a socket left behind by a previous run
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            raise Exception(f"{path} exists and is not a socket")
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # create the socket with the final permissions, not open until the chmod
+    umask = os.umask(0o777 & ~mode)
+    try:
+        sock.bind(path)
+    except Exception:
+        sock.close()
+        raise
+    finally:
+        os.umask(umask)
+    os.chmod(path, mode)
+    return sock
 
 
 @cli.command()
@@ -29,6 +75,8 @@ def wallet():
 @cli.command()
 def deploy():
     """Deploy the service registry contract"""
+    from bionet.w3 import deploy_contract
+
     contract_address = deploy_contract()
     click.echo(" Service Registry Deployed!")
     click.echo(f" contract address  : {contract_address}")
@@ -40,6 +88,8 @@ def deploy():
 )
 def register(user):
     """Register a user with the service"""
+    from bionet.w3 import register_user
+
     result = register_user(user)
     click.echo(" User registered!")
     click.echo(f" tx receipt  : {result}")
@@ -51,6 +101,8 @@ def register(user):
 )
 def is_valid(user):
     """Check if the user is valid"""
+    from bionet.w3 import is_authorized_user
+
     is_valid = is_authorized_user(user)
     if is_valid:
         click.echo(" User IS authorized")
@@ -64,17 +116,39 @@ def is_valid(user):
 )
 def remove(user):
     """Remove the user from the service"""
+    from bionet.w3 import remove_user
+
     result = remove_user(user)
     click.echo(" User removed!")
     click.echo(f" tx receipt  : {result}")
 
 
+@cli.command()
+@click.option("--out", default="registry.snapshot", help="snapshot file to write")
+def snapshot(out):
+    """Export a signed snapshot of the registry's authorized users"""
+    from starlette.config import Config
+    from bionet.w3 import authorized_users
+    from bionet.snapshot import write_snapshot
+
+    config = Config(".env")
+    contract = config("SERVICE_CONTRACT_ADDRESS", cast=str)
+    users, block = authorized_users(contract)
+    write_snapshot(out, users, block, contract, config("SECRET_KEY", cast=str))
+    click.echo(" Snapshot written!")
+    click.echo(f" file   : {out}")
+    click.echo(f" block  : {block}")
+    click.echo(f" users  : {len(users)}")
+
+
 ## Commands below are used for the example ##
 
 
 @cli.command()
 def service():
     """Start example DNA service. Remember to start the guard first"""
+    import uvicorn
+
     click.echo("Starting example DNA service...")
     uvicorn.run("example.dnaservice:app", port=8080, log_level="info")
 
@@ -0,0 +1,158 @@
+"""
+Signature work for the guard, optionally run in a pool of worker processes.
+
+Recovering and creating signatures is pure Python and holds the GIL, so a guard
+process tops out at one core. Setting `CRYPTO_WORKERS` to a number of processes
+sends that work to a process pool instead. Calls arriving together are batched
+(up to `CRYPTO_BATCH_SIZE`, waiting at most `CRYPTO_BATCH_DELAY` seconds) so many
+of them share one round trip to a worker.
+
+With `CRYPTO_WORKERS=0` (the default) the work runs inline, as before.
+
+If a worker dies, the calls waiting on the pool fail and a new pool is started
+for the next batch.
+"""
+import asyncio
+import multiprocessing
+from typing import Callable, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from siwe import SiweMessage
+
+from bionet.types import Token
+
+
+def siwe_verify(message: str, signature: str, domain: str = None) -> str:
+    """
+    Verify the signed SIWE message, and its domain if given.
+    Returns the signer's address
+    """
+    # parsed here, a parsed SiweMessage doesn't survive pickling to a worker
+    siwe_message = SiweMessage(message=message)
+    try:
+        siwe_message.verify(signature, domain=domain)
+    except Exception as e:
+        # siwe's exceptions have no message
+        raise Exception(str(e) or type(e).__name__)
+    return siwe_message.address
+
+
+def token_sign(token: Token, issuer_private_key: str) -> str:
+    return token.sign(issuer_private_key)
+
+
+def token_verify(token: str, domain: str) -> Token:
+    return Token.verify_payload(token, domain)
+
+
+def _run_batch(jobs: List[Tuple[Callable, tuple]]) -> List[Tuple[bool, object]]:
+    """
+    Run in a worker. Exceptions are returned as strings, they may not pickle
+    """
+    results = []
+    for fn, args in jobs:
+        try:
+            results.append((True, fn(*args)))
+        except Exception as e:
+            results.append((False, str(e)))
+    return results
+
+
+class CryptoPool:
+    """
+    Runs signature work inline or batched in a process pool
+    """
+
+    def __init__(self, workers: int = 0, batch_size: int = 32, batch_delay=0.002):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self._executor = None
+        self._pending = []
+        self._flush_handle = None
+
+    async def run(self, fn: Callable, *args):
+        """
+        Run one of the functions above and return its result.
+        Throws exception if it fails
+        """
+        if self.workers == 0:
+            return fn(*args)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((fn, args, future))
+        if len(self._pending) >= self.batch_size * self.workers:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_delay, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        # never raises, the callers waiting on the batch get the error instead
+        try:
+            if self._executor is None:
+                # spawn, forking a process running an event loop and threads is unsafe
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            executor = self._executor
+
+            # spread the batch over the workers
+            size = max(1, min(self.batch_size, -(-len(pending) // self.workers)))
+            for i in range(0, len(pending), size):
+                chunk = pending[i : i + size]
+                jobs = [(fn, args) for fn, args, _ in chunk]
+                done = asyncio.wrap_future(executor.submit(_run_batch, jobs))
+                done.add_done_callback(
+                    lambda d, chunk=chunk: self._resolve(executor, chunk, d)
+                )
+        except Exception as e:
+            self._discard(self._executor)
+            _fail(pending, e)
+
+    def _resolve(self, executor: ProcessPoolExecutor, chunk, done: asyncio.Future):
+        if done.cancelled():
+            _fail(chunk, Exception("Signature work was cancelled"))
+            return
+        if done.exception() is not None:
+            if isinstance(done.exception(), BrokenProcessPool):
+                self._discard(executor)
+            _fail(chunk, done.exception())
+            return
+        _set_results(chunk, done.result())
+
+    def _discard(self, executor: ProcessPoolExecutor):
+        # a broken pool can't be used again, the next flush starts a new one
+        if executor is not None and executor is self._executor:
+            self._executor = None
+            executor.shutdown(wait=False)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def _fail(chunk, error: BaseException):
+    for _, _, future in chunk:
+        if not future.done():
+            future.set_exception(error)
+
+
+def _set_results(chunk, results: List[Tuple[bool, object]]):
+    for (_, _, future), (ok, result) in zip(chunk, results):
+        if future.done():
+            continue
+        if ok:
+            future.set_result(result)
+        else:
+            future.set_exception(Exception(result))
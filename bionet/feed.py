@@ -0,0 +1,94 @@
+"""
+Feed of authorization changes streamed to services.
+
+Services that cache verification results subscribe to the feed to learn when a
+user is removed from the registry or a token is revoked, instead of re-verifying.
+
+Each event has an id of the form `{epoch}-{sequence}`. A subscriber passes the id of
+the last event it saw to resume. The feed keeps a bounded number of events in memory;
+if the cursor is too old, or is from before a guard restart (different epoch), the
+subscriber is sent a `reset` event and should drop everything it has cached.
+"""
+import asyncio
+import secrets
+from collections import deque
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+# (id, kind, data)
+Event = Tuple[str, str, Dict]
+
+
+class ChangeFeed:
+    """
+    Bounded, in-memory log of authorization changes for one tenant.
+    Must only be used from the event loop.
+    """
+
+    def __init__(self, size: int = 4096):
+        self.epoch = secrets.token_hex(4)
+        self.seq = 0
+        self.events = deque(maxlen=size)
+        self.poller: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def _id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def _oldest(self) -> int:
+        return self.events[0][0] if self.events else self.seq + 1
+
+    def publish(self, kind: str, data: Dict) -> str:
+        """
+        Add an event to the feed and wake subscribers.
+        Returns the event id
+        """
+        self.seq += 1
+        self.events.append((self.seq, kind, data))
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+        return self._id(self.seq)
+
+    def resume_point(self, cursor: Optional[str]) -> Optional[int]:
+        """
+        Return the sequence number to resume after, or None if the cursor
+        can't be resumed. No cursor starts at the head of the feed.
+        """
+        if not cursor:
+            return self.seq
+        epoch, _, seq = cursor.partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        if seq > self.seq or seq < self._oldest() - 1:
+            return None
+        return seq
+
+    async def subscribe(
+        self, cursor: Optional[str] = None, keepalive: float = 15.0
+    ) -> AsyncIterator[Optional[Event]]:
+        """
+        Yield events after the cursor as they are published.
+        Yields None every `keepalive` seconds when there are no events.
+        """
+        last = self.resume_point(cursor)
+        if last is None:
+            last = self.seq
+            yield (self._id(last), "reset", {})
+
+        while True:
+            changed = self._changed
+            if last < self._oldest() - 1:
+                # fell too far behind
+                last = self.seq
+                yield (self._id(last), "reset", {})
+
+            pending = [e for e in self.events if e[0] > last]
+            for seq, kind, data in pending:
+                last = seq
+                yield (self._id(seq), kind, data)
+
+            if last == self.seq:
+                try:
+                    await asyncio.wait_for(changed.wait(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
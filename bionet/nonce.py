@@ -0,0 +1,71 @@
+"""
+Stateless SIWE nonces.
+
+A nonce is an HMAC of the current time bucket, keyed by the tenant's secret key,
+followed by the bucket number:
+
+    nonce = hex(hmac(key, domain:bucket))[:16] + hex(bucket)
+
+Every client in the same bucket gets the same nonce, so it can be fetched once and
+cached (by the client or the service). The guard checks a nonce by recomputing the
+HMAC, without remembering the challenges it handed out. A nonce is accepted during
+its own bucket and the next one.
+"""
+import hmac
+import time
+import hashlib
+from functools import lru_cache
+
+DIGEST_SIZE = 16
+
+
+@lru_cache(maxsize=None)
+def nonce_key(secret_key: str) -> bytes:
+    """
+    Key for nonces derived from the tenant's secret key
+    """
+    return hashlib.sha256(b"bionet-siwe-nonce:" + secret_key.encode("utf-8")).digest()
+
+
+def make_nonce(key: bytes, domain: str, bucket_seconds: int, now: float = None) -> str:
+    """
+    Return the nonce for the current time bucket
+    """
+    if now is None:
+        now = time.time()
+    bucket = int(now // bucket_seconds)
+    return _digest(key, domain, bucket) + f"{bucket:x}"
+
+
+def nonce_expires(nonce: str, bucket_seconds: int) -> int:
+    """
+    Return the time (unix seconds) the nonce stops being accepted
+    """
+    bucket = int(nonce[DIGEST_SIZE:], 16)
+    return (bucket + 2) * bucket_seconds
+
+
+def check_nonce(
+    key: bytes, nonce: str, domain: str, bucket_seconds: int, now: float = None
+):
+    """
+    Throws exception if the nonce wasn't made by `make_nonce` with the same
+    key and domain, or is no longer fresh
+    """
+    if now is None:
+        now = time.time()
+    digest, bucket = nonce[:DIGEST_SIZE], nonce[DIGEST_SIZE:]
+    try:
+        bucket = int(bucket, 16)
+    except ValueError:
+        raise Exception("Invalid nonce")
+
+    if not hmac.compare_digest(digest, _digest(key, domain, bucket)):
+        raise Exception("Invalid nonce")
+    if bucket not in (int(now // bucket_seconds), int(now // bucket_seconds) - 1):
+        raise Exception("The nonce has expired")
+
+
+def _digest(key: bytes, domain: str, bucket: int) -> str:
+    message = f"{domain}:{bucket}".encode("utf-8")
+    return hmac.new(key, message, hashlib.sha256).hexdigest()[:DIGEST_SIZE]
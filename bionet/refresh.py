@@ -0,0 +1,141 @@
+"""
+Refresh tokens, exchanged for a new access token without repeating the SIWE login.
+
+A refresh token is an opaque random string. Each use returns a new refresh token
+and retires the old one (rotation). All tokens descended from one login form a
+family; presenting a retired token means it was copied, so the whole family is
+revoked, along with the access tokens issued from it. Revoking one of those access
+tokens (logging out) also retires its family.
+
+Refresh tokens are kept in memory, so a guard restart sends clients back through
+the full login.
+"""
+import time
+import hashlib
+import secrets
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+
+@dataclass
+class _Family:
+    address: str
+    expires: float
+    current: str = ""
+    # hashes of every refresh token of the family, kept to detect reuse
+    keys: List[str] = field(default_factory=list)
+    # (jti, exp) of the access tokens issued to the family
+    issued: List[Tuple[str, int]] = field(default_factory=list)
+
+
+class RefreshTokens:
+    """
+    Refresh tokens issued by one tenant
+    """
+
+    def __init__(self):
+        # hash of token -> family id
+        self._tokens: Dict[str, str] = {}
+        self._families: Dict[str, _Family] = {}
+        # jti of issued access token -> family id
+        self._access_tokens: Dict[str, str] = {}
+        self._pruned_at = time.time()
+
+    def issue(self, address: str, expiration_in_hours: int) -> str:
+        """
+        Start a new family for a login and return its first refresh token
+        """
+        self._prune()
+        family_id = secrets.token_hex(16)
+        expires = time.time() + expiration_in_hours * 3600
+        self._families[family_id] = _Family(address=address, expires=expires)
+        return self._next(family_id)
+
+    def record_access_token(self, refresh_token: str, jti: str, exp: int):
+        """
+        Remember an access token issued alongside the refresh token so it can be
+        revoked with the family
+        """
+        family_id = self._tokens.get(_hash(refresh_token))
+        family = self._families.get(family_id)
+        if family is not None:
+            family.issued.append((jti, exp))
+            self._access_tokens[jti] = family_id
+
+    def revoke(self, jti: str) -> List[Tuple[str, int]]:
+        """
+        Retire the family an access token was issued to, e.g. on logout.
+
+        Returns (jti, exp) of every access token issued to the family,
+        empty if the token didn't come with a refresh token
+        """
+        family_id = self._access_tokens.get(jti)
+        family = self._families.get(family_id)
+        if family is None:
+            return []
+        self._revoke(family_id)
+        return family.issued
+
+    def rotate(self, refresh_token: str) -> Tuple[str, str]:
+        """
+        Exchange a refresh token for a new one.
+
+        Returns (subject address, new refresh token)
+        Throws RefreshTokenReuse if the token was already used, after
+        revoking the family. Throws Exception for unknown or expired tokens
+        """
+        key = _hash(refresh_token)
+        family_id = self._tokens.get(key)
+        family = self._families.get(family_id)
+        if family is None:
+            raise Exception("Unknown refresh token")
+        if time.time() > family.expires:
+            self._revoke(family_id)
+            raise Exception("The refresh token has expired")
+        if family.current != key:
+            self._revoke(family_id)
+            raise RefreshTokenReuse(family)
+
+        return (family.address, self._next(family_id))
+
+    def _next(self, family_id: str) -> str:
+        token = secrets.token_urlsafe(32)
+        key = _hash(token)
+        self._tokens[key] = family_id
+        family = self._families[family_id]
+        family.current = key
+        family.keys.append(key)
+        return token
+
+    def _revoke(self, family_id: str):
+        family = self._families.pop(family_id, None)
+        if family is not None:
+            for key in family.keys:
+                self._tokens.pop(key, None)
+            for jti, _ in family.issued:
+                self._access_tokens.pop(jti, None)
+
+    def _prune(self):
+        # at most once a minute, logins shouldn't pay for a scan each time
+        now = time.time()
+        if now - self._pruned_at < 60:
+            return
+        self._pruned_at = now
+        expired = [f for f, family in self._families.items() if family.expires < now]
+        for family_id in expired:
+            self._revoke(family_id)
+
+
+class RefreshTokenReuse(Exception):
+    """
+    A retired refresh token was presented. The family has been revoked
+    """
+
+    def __init__(self, family: _Family):
+        super().__init__("Refresh token reuse detected, all tokens revoked")
+        self.address = family.address
+        self.issued = family.issued
+
+
+def _hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
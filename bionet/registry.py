@@ -0,0 +1,267 @@
+"""
+Registry backends used by the guard to check if a user is authorized.
+
+The backend is chosen per tenant with `REGISTRY_BACKEND`:
+
+rpc      : call `isValidUser` on the ServiceRegistry contract (default)
+snapshot : look the user up in the signed snapshot file at `SNAPSHOT_PATH`.
+           The snapshot must be signed by the tenant's `SECRET_KEY`.
+           See bionet.snapshot
+
+Reads over RPC are protected from a slow or failing node:
+
+- each call is bounded by `RPC_TIMEOUT` seconds (see bionet.w3)
+- after `BREAKER_THRESHOLD` consecutive errors calls to that node fail fast for
+  `BREAKER_RESET` seconds, then a single call is let through to probe the node.
+  Only errors reaching the node (timeouts, connection and provider errors) count,
+  a misconfigured tenant doesn't trip the breaker for the others on the node
+- authorized results are cached for `REGISTRY_CACHE_TTL` seconds. For a further
+  `REGISTRY_STALE_GRACE` seconds the cached result is returned while it is
+  refreshed in the background. Both default to 0 (no caching). Each contract
+  keeps at most `REGISTRY_CACHE_SIZE` results.
+
+Users that are not authorized are never cached, so a newly registered user is
+accepted straight away. A cached result does mean a removed user stays authorized
+for up to TTL + grace seconds. The change feed drops the cached result when it sees
+the removal, but the feed only watches the contract once a service subscribes to
+GET /registry/changes.
+
+`stats` counts what happened and is served by GET /registry/status
+"""
+import time
+import threading
+from urllib.parse import urlparse
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+from starlette.config import Config
+from web3.exceptions import ProviderConnectionError
+from requests.exceptions import RequestException, Timeout
+
+from bionet.w3 import is_authorized_user
+from bionet.tenants import Tenant
+from bionet.snapshot import open_snapshot
+
+config = Config(".env")
+stats = Counter()
+# updated from request threads and cache refreshes
+_stats_lock = threading.Lock()
+
+# errors that mean the node is unavailable, counted by the circuit breaker
+NODE_ERRORS = (RequestException, ProviderConnectionError)
+
+
+def _count(name: str):
+    with _stats_lock:
+        stats[name] += 1
+
+
+class CircuitBreaker:
+    """
+    Fail fast after repeated errors.
+
+    closed    : calls go through
+    open      : calls are rejected until `reset_after` seconds have passed
+    half-open : one probe call goes through; success closes, failure re-opens
+    """
+
+    def __init__(self, threshold: int = 5, reset_after: float = 30.0):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.probing or time.monotonic() - self.opened_at >= self.reset_after:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                if self.opened_at is None or self.probing:
+                    _count("breaker_trips")
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+
+class RegistryCache:
+    """
+    Stale-while-revalidate cache of registry results, shared by all tenants.
+    Only authorized (True) results are kept. Each contract keeps at most `size`
+    results so one busy service can't evict the others.
+    """
+
+    def __init__(self, ttl: float = 0, grace: float = 0, size: int = 10000):
+        self.ttl = ttl
+        self.grace = grace
+        self.size = size
+        self.enabled = ttl > 0 or grace > 0
+        self._entries: Dict[str, OrderedDict] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4)
+
+    def lookup(self, contract: str, user: str, fetch: Callable[[], bool]) -> bool:
+        """
+        Return the result for the user, calling `fetch` when there is no usable
+        cached result
+        """
+        if not self.enabled:
+            return fetch()
+
+        key = user.lower()
+        with self._lock:
+            entries = self._entries.setdefault(contract, OrderedDict())
+            entry = entries.get(key)
+            if entry is not None:
+                entries.move_to_end(key)
+
+        if entry is not None:
+            result, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age <= self.ttl:
+                _count("cache_hits")
+                return result
+            if age <= self.ttl + self.grace:
+                _count("stale_served")
+                self._refresh(contract, key, fetch)
+                return result
+
+        _count("cache_misses")
+        result = fetch()
+        if result:
+            self._store(contract, key, result)
+        return result
+
+    def invalidate(self, contract: str, user: str):
+        with self._lock:
+            self._entries.get(contract, {}).pop(user.lower(), None)
+
+    def _store(self, contract: str, key: str, result: bool):
+        with self._lock:
+            entries = self._entries.setdefault(contract, OrderedDict())
+            entries[key] = (result, time.monotonic())
+            entries.move_to_end(key)
+            while len(entries) > self.size:
+                entries.popitem(last=False)
+
+    def _refresh(self, contract: str, key: str, fetch: Callable[[], bool]):
+        with self._lock:
+            if (contract, key) in self._refreshing:
+                return
+            self._refreshing.add((contract, key))
+
+        def run():
+            try:
+                if fetch():
+                    self._store(contract, key, True)
+                else:
+                    self.invalidate(contract, key)
+                _count("refreshes")
+            except Exception:
+                _count("refresh_errors")
+            finally:
+                with self._lock:
+                    self._refreshing.discard((contract, key))
+
+        self._executor.submit(run)
+
+
+cache = RegistryCache(
+    ttl=config("REGISTRY_CACHE_TTL", cast=float, default=0),
+    grace=config("REGISTRY_STALE_GRACE", cast=float, default=0),
+    size=config("REGISTRY_CACHE_SIZE", cast=int, default=10000),
+)
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def breaker(rpc_url: str) -> CircuitBreaker:
+    """
+    Return the circuit breaker for the node, shared by all tenants using it
+    """
+    if rpc_url not in _breakers:
+        _breakers[rpc_url] = CircuitBreaker(
+            threshold=config("BREAKER_THRESHOLD", cast=int, default=5),
+            reset_after=config("BREAKER_RESET", cast=float, default=30.0),
+        )
+    return _breakers[rpc_url]
+
+
+def is_registered(tenant: Tenant, user: str) -> bool:
+    """
+    Check the tenant's registry for the user
+    """
+    if tenant.registry_backend == "snapshot":
+        snapshot = open_snapshot(
+            tenant.snapshot_path, tenant.issuer, tenant.contract_address
+        )
+        return snapshot.is_valid_user(user)
+    if tenant.registry_backend == "rpc":
+        return cache.lookup(
+            tenant.contract_address, user, lambda: _rpc_is_registered(tenant, user)
+        )
+    raise Exception(f"Unknown registry backend: {tenant.registry_backend}")
+
+
+def _rpc_is_registered(tenant: Tenant, user: str) -> bool:
+    if len(tenant.contract_address) == 0:
+        raise Exception(f"No service contract address for {tenant.name}")
+
+    node = breaker(tenant.rpc_url)
+    if not node.allow():
+        _count("breaker_rejections")
+        raise Exception("Registry unavailable: too many errors from the Ethereum node")
+
+    _count("rpc_calls")
+    try:
+        result = is_authorized_user(user, tenant.contract_address, tenant.rpc_url)
+    except NODE_ERRORS as e:
+        _count("rpc_errors")
+        if isinstance(e, Timeout):
+            _count("rpc_timeouts")
+        node.failure()
+        raise
+    except Exception:
+        # the node answered, e.g. the call reverted
+        _count("rpc_errors")
+        node.success()
+        raise
+    node.success()
+    return result
+
+
+def status() -> Dict:
+    """
+    Counters and circuit breaker states
+    """
+    with _stats_lock:
+        counters = dict(stats)
+    return {
+        "counters": counters,
+        # only the host, node URLs often carry API keys
+        "breakers": {urlparse(url).netloc: b.state for url, b in _breakers.items()},
+    }
@@ -7,58 +7,158 @@ Request Body: {address: '...'}
 Response    : {message: 'msg to sign...'}
 Status Code 200 on success, 400 on error
 
+GET   /authenticate/params
+Response    : {domain: '...', uri: '...', chain_id: 1, version: '1', nonce: '...', expires: unix seconds}
+The parameters needed to build a SIWE message without first requesting a challenge.
+The nonce is shared by all clients until `expires`. See bionet.nonce
+
 POST  /authenticate/verify
 Request Body: {message: 'siwe msg...', signature: '...'}
-Response    : {address: 'callers wallet address', token: 'jwt token'}
+Response    : {address: 'callers wallet address', token: 'jwt token', refresh_token: '...'}
 Status Code 200 on success, 400 on error
+refresh_token is only set when REFRESH_TOKEN_EXPIRATION is configured
+
+POST  /token/refresh
+Request Body: {refresh_token: '...'}
+Response    : {address: 'callers wallet address', token: 'jwt token', refresh_token: '...'}
+Status Code 200 on success, 400 on error. See bionet.refresh
 
 GET /token/verify{jwt token}
 Response    : {address: 'callers wallet address'}
 Status Code 200 on success, 400 on error
+
+POST /token/revoke/{jwt token}
+Response    : {address: 'callers wallet address'}
+Status Code 200 on success, 400 on error
+
+GET /registry/status
+Response    : {counters: {...}, breakers: {node: 'closed|open|half-open'}}
+
+GET /registry/changes?cursor={last event id}
+Response    : text/event-stream of authorization changes (registered, removed, revoked, reset)
+The Last-Event-ID header may be used instead of the cursor. See bionet.feed
+
+Each endpoint is also served under a tenant prefix, e.g. POST /{tenant}/authenticate/request.
+Requests without a prefix are routed to a tenant by the Host header.
+See bionet.tenants for the tenant configuration.
+
+Signature work can be run in a pool of worker processes, see bionet.crypto
 """
 
+import json
+import time
+import asyncio
+import logging
+from typing import Dict, Optional
 from urllib.parse import urlparse
 from dateutil.tz import UTC
 from datetime import datetime, timedelta
 
 from starlette.config import Config
-from fastapi import FastAPI, HTTPException
-from starlette.datastructures import Secret
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response, StreamingResponse
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request, Header
 
-from siwe import SiweMessage, generate_nonce
+from siwe import SiweMessage
 
-from bionet.w3 import is_authorized_user
+from bionet import registry
+from bionet.crypto import CryptoPool, siwe_verify, token_sign, token_verify
+from bionet.registry import is_registered
+from bionet.w3 import latest_block, registry_events
+from bionet.tenants import Tenant, Tenants, load_tenants
+from bionet.refresh import RefreshTokenReuse
+from bionet.nonce import nonce_key, make_nonce, nonce_expires, check_nonce
 
 
 from bionet.types import (
     Token,
     SignedMessage,
+    RefreshRequest,
     ChallengeRequest,
-    ChallengeResponse,
-    AuthenticationResult,
+    response_encoder,
 )
 
 
 config = Config(".env")
 app = FastAPI()
+router = APIRouter()
+logger = logging.getLogger(__name__)
+crypto = CryptoPool(
+    workers=config("CRYPTO_WORKERS", cast=int, default=0),
+    batch_size=config("CRYPTO_BATCH_SIZE", cast=int, default=32),
+    batch_delay=config("CRYPTO_BATCH_DELAY", cast=float, default=0.002),
+)
+
+_tenants: Tenants = None
+
+
+def _json(content: Dict, headers: Dict = None) -> Response:
+    """
+    Return the response serialized once, skipping FastAPI's model validation and
+    encoding. The bytes are the same as returning the ChallengeResponse or
+    AuthenticationResult models.
+    """
+    return Response(
+        response_encoder.encode(content),
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+def _auth_result(address: str, token: str = None, refresh_token: str = None):
+    return _json({"address": address, "token": token, "refresh_token": refresh_token})
+
+
+def _revoke(tenant: Tenant, address: str, jti: str, exp: int):
+    # forget revocations for tokens that have expired anyway
+    now = int(datetime.now(UTC).timestamp())
+    for revoked_jti, revoked_exp in list(tenant.revoked.items()):
+        if revoked_exp < now:
+            del tenant.revoked[revoked_jti]
 
+    if jti not in tenant.revoked and exp >= now:
+        tenant.revoked[jti] = exp
+        tenant.feed.publish("revoked", {"address": address, "jti": jti})
 
-@app.post("/authenticate/request")
-async def siwe_request(req: ChallengeRequest):
+
+async def current_tenant(request: Request) -> Tenant:
+    """
+    Resolve the tenant for the request from the path prefix or Host header
+    """
+    name = request.path_params.get("tenant")
+    tenant = _tenants.resolve(name, request.headers.get("host"))
+    if tenant is None:
+        raise HTTPException(status_code=404, detail="unknown service")
+    return tenant
+
+
+@app.on_event("startup")
+def startup():
+    global _tenants
+    _tenants = load_tenants(config)
+
+
+@app.on_event("shutdown")
+def shutdown():
+    crypto.shutdown()
+
+
+@router.post("/authenticate/request")
+async def siwe_request(req: ChallengeRequest, tenant: Tenant = Depends(current_tenant)):
     """
     Given the input return a SIWE message for the user to sign.
     Called from the service.
     """
     input = {}
-    url = config("LOGIN_URL", cast=str)
+    url = tenant.login_url
     input["uri"] = url
     input["domain"] = urlparse(url).netloc
     input["address"] = req.address
-    input["chain_id"] = config("CHAIN_ID", cast=int)
-    input["version"] = config("VERSION", cast=str)
-    input["nonce"] = generate_nonce()
+    input["chain_id"] = tenant.chain_id
+    input["version"] = tenant.version
+    input["nonce"] = _nonce(tenant)
 
-    delta = config("CHALLENGE_EXPIRATION", cast=int)
+    delta = tenant.challenge_expiration
     issued = datetime.utcnow()
     ex = issued + timedelta(seconds=delta)
 
@@ -67,49 +167,213 @@ async def siwe_request(req: ChallengeRequest):
 
     try:
         siwe_message = SiweMessage(message=input).prepare_message()
-        return ChallengeResponse(message=siwe_message)
+        return _json({"message": siwe_message})
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"challenge error: {e}")
 
 
-@app.post("/authenticate/verify")
-async def verify_signed_siwe_message(req: SignedMessage):
+@router.get("/authenticate/params")
+async def siwe_params(tenant: Tenant = Depends(current_tenant)):
+    """
+    Return what a client needs to build the SIWE message itself and log in
+    with a single request to /authenticate/verify.
+    Called from the service, which may cache the response until it expires.
+    """
+    url = tenant.login_url
+    nonce = _nonce(tenant)
+    expires = nonce_expires(nonce, tenant.challenge_expiration)
+    # leave the client a full bucket to use the nonce
+    max_age = max(0, expires - tenant.challenge_expiration - int(time.time()))
+    params = {
+        "domain": urlparse(url).netloc,
+        "uri": url,
+        "chain_id": tenant.chain_id,
+        "version": tenant.version,
+        "nonce": nonce,
+        "expires": expires,
+    }
+    return _json(params, headers={"Cache-Control": f"max-age={max_age}"})
+
+
+def _nonce(tenant: Tenant) -> str:
+    domain = urlparse(tenant.login_url).netloc
+    key = nonce_key(str(tenant.secret_key))
+    return make_nonce(key, domain, tenant.challenge_expiration)
+
+
+@router.post("/authenticate/verify")
+async def verify_signed_siwe_message(
+    req: SignedMessage, tenant: Tenant = Depends(current_tenant)
+):
     """
     Verify signed SIWE message.
     Called from the service.
     """
-    sk = config("SECRET_KEY", cast=Secret)
-    aud = config("DOMAIN", cast=str)
-    expires = config("TOKEN_EXPIRATION", cast=int)
+    sk = tenant.secret_key
+    aud = tenant.domain
+    expires = tenant.token_expiration
 
     try:
-        message = SiweMessage(message=req.message)
-        message.verify(req.signature)
-        token = Token.create(message.address, aud, expires)
-        jwt = token.sign(str(sk))
-        return AuthenticationResult(address=message.address, token=jwt).model_dump()
+        domain = urlparse(tenant.login_url).netloc
+        siwe_message = SiweMessage(message=req.message)
+        # the nonce check is cheap, reject bad ones before recovering the signer
+        key = nonce_key(str(sk))
+        check_nonce(key, siwe_message.nonce, domain, tenant.challenge_expiration)
+        address = await crypto.run(siwe_verify, req.message, req.signature, domain)
+        token = Token.create(address, aud, expires)
+        jwt = await crypto.run(token_sign, token, str(sk))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"verification error: {e}")
 
+    refresh_token = None
+    if tenant.refresh_token_expiration > 0:
+        refresh_tokens = tenant.refresh_tokens
+        refresh_token = refresh_tokens.issue(address, tenant.refresh_token_expiration)
+        refresh_tokens.record_access_token(refresh_token, token.jti, token.exp)
+    return _auth_result(address, jwt, refresh_token)
 
-@app.get("/token/verify/{token}")
-async def verify_token(token: str):
+
+@router.post("/token/refresh")
+async def refresh_access_token(
+    req: RefreshRequest, tenant: Tenant = Depends(current_tenant)
+):
+    """
+    Exchange a refresh token for a new JWT token and refresh token.
+    Called from the service.
+    """
+    refresh_tokens = tenant.refresh_tokens
+    try:
+        address, new_refresh_token = refresh_tokens.rotate(req.refresh_token)
+    except RefreshTokenReuse as e:
+        # someone else has a copy, revoke what was issued from it
+        for jti, exp in e.issued:
+            _revoke(tenant, e.address, jti, exp)
+        raise HTTPException(status_code=400, detail=f"refresh error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"refresh error: {e}")
+
+    try:
+        token = Token.create(address, tenant.domain, tenant.token_expiration)
+        jwt = await crypto.run(token_sign, token, str(tenant.secret_key))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"refresh error: {e}")
+
+    refresh_tokens.record_access_token(new_refresh_token, token.jti, token.exp)
+    return _auth_result(address, jwt, new_refresh_token)
+
+
+@router.get("/token/verify/{token}")
+async def verify_token(token: str, tenant: Tenant = Depends(current_tenant)):
     """
     Verify the given JWT token and if the user is registered with the contract
     Called from the service.
     """
-    domain = config("DOMAIN", cast=str)
+    domain = tenant.domain
     try:
-        subject_address = Token.verify(token, domain)
+        payload = await crypto.run(token_verify, token, domain)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"token error: {e}")
 
+    if payload.jti in tenant.revoked:
+        raise HTTPException(status_code=400, detail="token error: token revoked")
+    subject_address = payload.sub
+
     # Check the contract here...
-    is_valid = is_authorized_user(subject_address)
+    try:
+        async with tenant.limiter:
+            is_valid = await run_in_threadpool(is_registered, tenant, subject_address)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"registry error: {e}")
     if not is_valid:
         raise HTTPException(
             status_code=400, detail="Not a registered user of the service"
         )
 
     # Check the contract here...
-    return AuthenticationResult(address=subject_address).model_dump()
+    return _auth_result(subject_address)
+
+
+@router.post("/token/revoke/{token}")
+async def revoke_token(token: str, tenant: Tenant = Depends(current_tenant)):
+    """
+    Revoke the given JWT token, e.g. when the user logs out.
+    Called from the service.
+    """
+    try:
+        payload = await crypto.run(token_verify, token, tenant.domain)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"token error: {e}")
+
+    _revoke(tenant, payload.sub, payload.jti, payload.exp)
+    # logging out ends the refresh token family too, with its other access tokens
+    for jti, exp in tenant.refresh_tokens.revoke(payload.jti):
+        _revoke(tenant, payload.sub, jti, exp)
+    return _auth_result(payload.sub)
+
+
+@router.get("/registry/status")
+async def registry_status():
+    """
+    Registry read counters and circuit breaker states
+    """
+    return registry.status()
+
+
+@router.get("/registry/changes")
+async def registry_changes(
+    cursor: Optional[str] = None,
+    last_event_id: Optional[str] = Header(default=None),
+    tenant: Tenant = Depends(current_tenant),
+):
+    """
+    Stream authorization changes as server-sent events.
+    Called from the service.
+    """
+    feed = tenant.feed
+    if feed.poller is None and tenant.registry_backend == "rpc":
+        if len(tenant.contract_address) > 0:
+            feed.poller = asyncio.create_task(_poll_registry(tenant))
+
+    async def stream():
+        async for event in feed.subscribe(cursor or last_event_id):
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            event_id, kind, data = event
+            yield f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+async def _poll_registry(tenant: Tenant):
+    """
+    Publish the registry contract's Register/Removed events to the tenant's feed
+    """
+    interval = config("FEED_POLL_INTERVAL", cast=float, default=2.0)
+    next_block = None
+    while True:
+        try:
+            latest = await run_in_threadpool(latest_block, tenant.rpc_url)
+            if next_block is None:
+                next_block = latest + 1
+            if latest >= next_block:
+                events = await run_in_threadpool(
+                    registry_events,
+                    tenant.contract_address,
+                    tenant.rpc_url,
+                    next_block,
+                    latest,
+                )
+                for e in events:
+                    kind = "registered" if e["event"] == "Register" else "removed"
+                    data = {"address": e["args"]["to"], "block": e["blockNumber"]}
+                    registry.cache.invalidate(tenant.contract_address, data["address"])
+                    tenant.feed.publish(kind, data)
+                next_block = latest + 1
+        except Exception as e:
+            logger.warning(f"registry feed for {tenant.name}: {e}")
+        await asyncio.sleep(interval)
+
+
+app.include_router(router)
+app.include_router(router, prefix="/{tenant}")
@@ -0,0 +1,210 @@
+"""
+Signed snapshot of the users authorized by a ServiceRegistry contract.
+
+A snapshot lets the guard check users without an Ethereum node, for example at
+an air-gapped site. The file is a fixed header followed by the sorted 20 byte
+addresses of the authorized users:
+
+magic         8 bytes   b"BNETSNAP"
+version       uint16
+reserved      uint16
+count         uint32    number of address records
+block_number  uint64    block the snapshot was taken at
+contract      20 bytes  address of the ServiceRegistry contract
+signature     65 bytes  issuer's signature
+records       count * 20 bytes
+
+All integers are big-endian. The issuer signs the keccak hash of the file with
+the signature bytes zeroed (EIP-191 personal message).
+
+The guard memory-maps the file and binary searches the records, so nothing is
+parsed at startup. A new snapshot is swapped in when the file is replaced, unless
+it was taken at an earlier block than the one in use.
+"""
+import os
+import mmap
+import struct
+import logging
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Iterable
+
+from eth_account import Account
+from Crypto.Hash import keccak as keccak256
+from eth_utils import keccak, to_canonical_address, to_checksum_address
+from eth_account.messages import encode_defunct
+
+MAGIC = b"BNETSNAP"
+VERSION = 1
+HEADER = struct.Struct(">8sHHIQ20s65s")
+RECORD_SIZE = 20
+SIGNATURE_OFFSET = HEADER.size - 65
+
+logger = logging.getLogger(__name__)
+
+
+def write_snapshot(
+    path: str,
+    users: Iterable[str],
+    block_number: int,
+    contract: str,
+    issuer_private_key: str,
+):
+    """
+    Write a signed snapshot to the given path.
+
+    Params:
+    path: where to write the snapshot. An existing file is replaced atomically
+    users: addresses of the authorized users
+    block_number: the block the user set was read at
+    contract: address of the ServiceRegistry contract
+    issuer_private_key: key used to sign the snapshot
+    """
+    records = b"".join(sorted({to_canonical_address(u) for u in users}))
+    count = len(records) // RECORD_SIZE
+    unsigned = HEADER.pack(
+        MAGIC,
+        VERSION,
+        0,
+        count,
+        block_number,
+        to_canonical_address(contract),
+        bytes(65),
+    )
+
+    digest = keccak(unsigned + records)
+    account = Account.from_key(issuer_private_key)
+    signature = account.sign_message(encode_defunct(primitive=digest)).signature
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(unsigned[:SIGNATURE_OFFSET])
+        f.write(signature)
+        f.write(records)
+    os.replace(tmp_path, path)
+
+
+class _Records:
+    """Sequence view of the address records for bisect"""
+
+    def __init__(self, data: mmap.mmap, count: int):
+        self.data = data
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i: int) -> bytes:
+        start = HEADER.size + i * RECORD_SIZE
+        return self.data[start : start + RECORD_SIZE]
+
+
+class Snapshot:
+    """
+    A memory-mapped snapshot file
+    """
+
+    def __init__(self, path: str, issuer: str, expected_contract: str):
+        """
+        Open and verify the snapshot
+
+        Params:
+        path: the snapshot file
+        issuer: the address expected to have signed the snapshot
+        expected_contract: the ServiceRegistry contract the snapshot must be taken from
+
+        Throws exception if the file is malformed, not signed by the issuer
+        or taken from another contract
+        """
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.data) < HEADER.size:
+            raise Exception("Snapshot file is too short")
+
+        magic, version, _, count, block, contract, sig = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            raise Exception("Not a bionet snapshot file")
+        if len(self.data) != HEADER.size + count * RECORD_SIZE:
+            raise Exception("Snapshot file size does not match the record count")
+
+        # hash the mapped file in place rather than copying the records
+        view = memoryview(self.data)
+        try:
+            hasher = keccak256.new(data=view[:SIGNATURE_OFFSET], digest_bits=256)
+            hasher.update(bytes(65))
+            hasher.update(view[HEADER.size :])
+            digest = hasher.digest()
+        finally:
+            view.release()
+        signer = Account.recover_message(
+            encode_defunct(primitive=digest), signature=sig
+        )
+        if signer.lower() != issuer.lower():
+            raise Exception("Snapshot is not signed by the issuer")
+        if contract != to_canonical_address(expected_contract):
+            raise Exception("Snapshot is for another registry contract")
+
+        self.block_number = block
+        self.contract = to_checksum_address(contract)
+        self.records = _Records(self.data, count)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, user: str) -> bool:
+        address = to_canonical_address(user)
+        i = bisect_left(self.records, address)
+        return i < len(self.records) and self.records[i] == address
+
+
+class SnapshotRegistry:
+    """
+    Registry backend answering `isValidUser` from a snapshot file.
+    Picks up a new snapshot when the file is replaced.
+    """
+
+    def __init__(self, path: str, issuer: str, contract: str):
+        self.path = path
+        self.issuer = issuer
+        self.contract = contract
+        self._stat = None
+        self._snapshot = None
+        self._reload()
+
+    def _reload(self):
+        st = os.stat(self.path)
+        key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if key == self._stat:
+            return
+        self._stat = key
+        try:
+            snapshot = Snapshot(self.path, self.issuer, self.contract)
+            if self._snapshot is not None and snapshot.block_number < self.block_number:
+                raise Exception(f"Snapshot goes back to block {snapshot.block_number}")
+        except Exception as e:
+            if self._snapshot is None:
+                self._stat = None
+                raise
+            logger.warning(
+                f"keeping snapshot at block {self._snapshot.block_number}: {e}"
+            )
+            return
+        # Readers holding the old snapshot keep a valid mapping until they finish
+        self._snapshot = snapshot
+
+    @property
+    def block_number(self) -> int:
+        return self._snapshot.block_number
+
+    def is_valid_user(self, user: str) -> bool:
+        self._reload()
+        return user in self._snapshot
+
+
+@lru_cache(maxsize=None)
+def open_snapshot(path: str, issuer: str, contract: str) -> SnapshotRegistry:
+    """
+    Return the shared snapshot registry for the given file
+    """
+    return SnapshotRegistry(path, issuer, contract)
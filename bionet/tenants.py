@@ -0,0 +1,168 @@
+"""
+Tenant settings used to serve several services from a single guard.
+
+By default the guard serves one tenant built from the `.env` file, exactly as before.
+Setting `TENANTS_FILE` in `.env` points the guard at a JSON file with one entry per
+service:
+
+{
+    "dna": {
+        "host": "dna.example.com",
+        "login_url": "https://dna.example.com/login",
+        "domain": "dna.example.com",
+        "secret_key": "0x...",
+        "service_contract_address": "0x..."
+    },
+    ...
+}
+
+Any of `rpc_node_url`, `chain_id`, `version`, `challenge_expiration`, `token_expiration`,
+`max_concurrency`, `registry_backend`, `snapshot_path` and `refresh_token_expiration`
+may be set per tenant,
+otherwise the value from `.env` is used.
+
+A request is routed to a tenant by path prefix (`/{tenant}/token/verify/...`) or by
+the `Host` header. Requests that match neither go to `DEFAULT_TENANT` (or the only
+tenant when there is just one).
+"""
+import json
+import asyncio
+from typing import Dict, Optional
+from dataclasses import dataclass, field
+
+from eth_account import Account
+from starlette.config import Config
+from starlette.datastructures import Secret
+
+from bionet.feed import ChangeFeed
+from bionet.refresh import RefreshTokens
+
+
+@dataclass
+class Tenant:
+    """
+    Settings for one service protected by the guard
+    """
+
+    name: str
+    domain: str
+    login_url: str
+    secret_key: Secret = field(repr=False)
+    contract_address: str
+    rpc_url: str
+    chain_id: int
+    version: str
+    challenge_expiration: int
+    token_expiration: int
+    host: str = ""
+    max_concurrency: int = 16
+    registry_backend: str = "rpc"
+    snapshot_path: str = ""
+    refresh_token_expiration: int = 0
+    issuer: str = field(init=False)
+    limiter: asyncio.Semaphore = field(init=False, repr=False)
+    feed: ChangeFeed = field(init=False, repr=False)
+    revoked: Dict[str, int] = field(init=False, repr=False)
+    refresh_tokens: RefreshTokens = field(init=False, repr=False)
+
+    def __post_init__(self):
+        # address of the secret key, slow to derive so done once
+        self.issuer = Account.from_key(str(self.secret_key)).address
+        # Bounds the number of registry reads a tenant can have in flight so one
+        # busy service can't take every worker thread from the others.
+        self.limiter = asyncio.Semaphore(self.max_concurrency)
+        self.feed = ChangeFeed()
+        # jti -> exp of revoked tokens
+        self.revoked = {}
+        self.refresh_tokens = RefreshTokens()
+
+
+class Tenants:
+    """
+    Lookup of tenants by name and host
+    """
+
+    def __init__(self, tenants: Dict[str, Tenant], default: str = ""):
+        self.by_name = tenants
+        self.by_host = {t.host.lower(): t for t in tenants.values() if t.host}
+        if not default and len(tenants) == 1:
+            default = next(iter(tenants))
+        self.default = tenants.get(default)
+
+    def resolve(self, name: Optional[str], host: Optional[str]) -> Optional[Tenant]:
+        """
+        Find the tenant for a request.
+
+        Params:
+        name: the tenant from the path prefix, if any
+        host: the value of the Host header, if any
+
+        Returns None if no tenant matches
+        """
+        if name:
+            return self.by_name.get(name)
+        if host:
+            tenant = self.by_host.get(host.split(":")[0].lower())
+            if tenant:
+                return tenant
+        return self.default
+
+
+def load_tenants(config: Config) -> Tenants:
+    """
+    Load the tenants from the file named by `TENANTS_FILE`, or a single
+    default tenant from the `.env` settings when no file is given.
+    """
+    defaults = {
+        "rpc_node_url": config("RPC_NODE_URL", cast=str, default=""),
+        "chain_id": config("CHAIN_ID", cast=int),
+        "version": config("VERSION", cast=str),
+        "challenge_expiration": config("CHALLENGE_EXPIRATION", cast=int),
+        "token_expiration": config("TOKEN_EXPIRATION", cast=int),
+        "max_concurrency": config("TENANT_MAX_CONCURRENCY", cast=int, default=16),
+        "registry_backend": config("REGISTRY_BACKEND", cast=str, default="rpc"),
+        "snapshot_path": config("SNAPSHOT_PATH", cast=str, default=""),
+        "refresh_token_expiration": config(
+            "REFRESH_TOKEN_EXPIRATION", cast=int, default=0
+        ),
+    }
+
+    tenants_file = config("TENANTS_FILE", cast=str, default="")
+    if len(tenants_file) == 0:
+        entry = {
+            "login_url": config("LOGIN_URL", cast=str),
+            "domain": config("DOMAIN", cast=str),
+            "secret_key": config("SECRET_KEY", cast=str),
+            "service_contract_address": config(
+                "SERVICE_CONTRACT_ADDRESS", cast=str, default=""
+            ),
+        }
+        tenant = _make_tenant("default", entry, defaults)
+        return Tenants({tenant.name: tenant}, tenant.name)
+
+    with open(tenants_file) as f:
+        entries = json.load(f)
+
+    tenants = {name: _make_tenant(name, e, defaults) for name, e in entries.items()}
+    return Tenants(tenants, config("DEFAULT_TENANT", cast=str, default=""))
+
+
+def _make_tenant(name: str, entry: Dict, defaults: Dict) -> Tenant:
+    values = {**defaults, **entry}
+    return Tenant(
+        name=name,
+        domain=values["domain"],
+        login_url=values["login_url"],
+        secret_key=Secret(values["secret_key"]),
+        contract_address=values["service_contract_address"],
+        rpc_url=values["rpc_node_url"],
+        chain_id=int(values["chain_id"]),
+        version=str(values["version"]),
+        challenge_expiration=int(values["challenge_expiration"]),
+        token_expiration=int(values["token_expiration"]),
+        host=values.get("host", ""),
+        max_concurrency=int(values["max_concurrency"]),
+        registry_backend=values["registry_backend"],
+        snapshot_path=values["snapshot_path"],
+        refresh_token_expiration=int(values["refresh_token_expiration"]),
+    )
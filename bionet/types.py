@@ -1,10 +1,11 @@
 import json
 import base64
 from typing import Optional, Dict
+from functools import lru_cache
 from dateutil.tz import UTC
 
 from datetime import datetime, timedelta
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields
 
 from pydantic import BaseModel
 from siwe import generate_nonce
@@ -12,6 +13,14 @@ from eth_account import Account
 from eth_utils.address import is_hex_address
 from eth_account.messages import encode_defunct
 
+# Encoders are built once, json.dumps builds a new one per call when given options.
+# Token payloads keep the json.dumps defaults so signed bytes don't change.
+_token_encoder = json.JSONEncoder(separators=(",", ":"))
+# Matches the output of FastAPI's JSONResponse
+response_encoder = json.JSONEncoder(
+    ensure_ascii=False, allow_nan=False, separators=(",", ":")
+)
+
 
 class ChallengeRequest(BaseModel):
     """Request for a SIWE message to sign"""
@@ -41,14 +50,26 @@ class AuthenticationResult(BaseModel):
     Structure used to hold the results of an authentication or token verification
     address: wallet address of caller
     token: JWT token
+    refresh_token: token to exchange for a new JWT token, if the guard issues them
     """
 
     address: str
     token: Optional[str] = None
+    refresh_token: Optional[str] = None
 
     @classmethod
     def from_json(cls, value: Dict) -> "AuthenticationResult":
-        return cls(address=value["address"], token=value["token"])
+        return cls(
+            address=value["address"],
+            token=value["token"],
+            refresh_token=value.get("refresh_token"),
+        )
+
+
+class RefreshRequest(BaseModel):
+    """Request to exchange a refresh token for a new JWT token"""
+
+    refresh_token: str
 
 
 @dataclass
@@ -102,27 +123,24 @@ class Token:
 
         On success, returns the JWT token
         """
-        account = Account.from_key(issuer_private_key)
+        account = _issuer_account(issuer_private_key)
         self.iss = account.address
-
-        payload = json.dumps(self.dict(), separators=(",", ":"))
+        payload = self.payload()
 
         encoded = encode_defunct(text=payload)
         signature = account.sign_message(encoded).signature.hex()
 
-        encoded_header = json.dumps(
-            {
-                "alg": "ES256",
-                "typ": "JWT",
-            },
-            separators=(",", ":"),
-        )
-
-        h = _base64_encode(encoded_header)
         p = _base64_encode(payload)
         s = _base64_encode(signature)
 
-        return f"{h}.{p}.{s}"
+        return f"{_TOKEN_HEADER}.{p}.{s}"
+
+    def payload(self) -> str:
+        """
+        Return the JSON payload that gets signed.
+        Same as json.dumps(asdict(token)) without the deep copy
+        """
+        return _token_encoder.encode({f: getattr(self, f) for f in _TOKEN_FIELDS})
 
     @staticmethod
     def verify(token: str, domain: str) -> str:
@@ -138,13 +156,27 @@ class Token:
 
         One of the key verifications is that the signer is the issuer
         """
+        return Token.verify_payload(token, domain).sub
+
+    @staticmethod
+    def decode(token: str) -> "Token":
+        """
+        Decode a raw token WITHOUT verifying it.
+        Used by clients to read the expiration time
+        """
         encoded_payload = token.split(".")[1]
-        encoded_signature = token.split(".")[2]
+        return Token(**json.loads(_base64decode(encoded_payload)))
+
+    @staticmethod
+    def verify_payload(token: str, domain: str) -> "Token":
+        """
+        Verify a raw token. Same as `verify` but returns the whole token
+        """
+        _, encoded_payload, encoded_signature = token.split(".")
 
         raw_payload = _base64decode(encoded_payload)
-        p_dict = json.loads(raw_payload)
         # thaw the token
-        payload = Token(**p_dict)
+        payload = Token(**json.loads(raw_payload))
 
         # recover the signer's address
         signature = _base64decode(encoded_signature)
@@ -176,13 +208,25 @@ class Token:
         if len(payload.sub) == 0:
             raise Exception("Invalid subject field (sub)")
 
-        return payload.sub
+        return payload
+
+
+_TOKEN_FIELDS = [f.name for f in fields(Token)]
 
 
 # Helpers...
+@lru_cache(maxsize=32)
+def _issuer_account(issuer_private_key: str):
+    # deriving the address from the key is the slow part of creating an account
+    return Account.from_key(issuer_private_key)
+
+
 def _base64_encode(value: str) -> str:
     return base64.b64encode(value.encode("utf-8")).decode("utf-8")
 
 
 def _base64decode(value: str) -> str:
     return base64.b64decode(value).decode("utf-8")
+
+
+_TOKEN_HEADER = _base64_encode(_token_encoder.encode({"alg": "ES256", "typ": "JWT"}))
@@ -2,6 +2,7 @@
 Web3 helpers and Contract Meta for the ServiceRegistry Contract
 """
 import json
+from functools import lru_cache
 
 from web3 import Web3
 from eth_account import Account
@@ -120,23 +121,91 @@ ABI = r"""
 BYTECODE = "0x608060405234801561001057600080fd5b50600080546001600160a01b0319163317905561034b806100326000396000f3fe608060405234801561001057600080fd5b506004361061004c5760003560e01c80632199d5cd1461005157806329092d0e14610066578063f3c95c6014610079578063f851a440146100ba575b600080fd5b61006461005f3660046102e5565b6100e5565b005b6100646100743660046102e5565b6101ed565b6100a56100873660046102e5565b6001600160a01b031660009081526001602052604090205460ff1690565b60405190151581526020015b60405180910390f35b6000546100cd906001600160a01b031681565b6040516001600160a01b0390911681526020016100b1565b6000546001600160a01b031633146101345760405162461bcd60e51b815260206004820152600d60248201526c2737ba103a34329030b236b4b760991b60448201526064015b60405180910390fd5b6001600160a01b03811660009081526001602052604090205460ff161561019d5760405162461bcd60e51b815260206004820152601760248201527f5573657220616c72656164792072656769737465726564000000000000000000604482015260640161012b565b6001600160a01b0381166000818152600160208190526040808320805460ff19169092179091555130917f98ada70a1cb506dc4591465e1ee9be3fd7a2b6c73ecf3b949009718c9a35151991a350565b6000546001600160a01b031633146102375760405162461bcd60e51b815260206004820152600d60248201526c2737ba103a34329030b236b4b760991b604482015260640161012b565b6001600160a01b03811660009081526001602081905260409091205460ff1615151461029b5760405162461bcd60e51b8152602060048201526013602482015272155cd95c881b9bdd081c9959da5cdd195c9959606a1b604482015260640161012b565b6001600160a01b038116600081815260016020526040808220805460ff191690555130917f40e634d0e26d9ec2e860e4dd9b7b2cfbb569b6058362a1a54d3a94718bc4958791a350565b6000602082840312156102f757600080fd5b81356001600160a01b038116811461030e57600080fd5b939250505056fea2646970667358221220d50485b1173c14ee0f3f84a1cfcb4274687fd499a202cfac6e2dc6c7d3b58e2f64736f6c63430008140033"
 
 
-def is_authorized_user(user: str) -> bool:
+@lru_cache(maxsize=None)
+def get_web3(rpc_url: str) -> Web3:
+    """
+    Return the Web3 connection for the given node. Connections are shared by every
+    caller (and every tenant) using the same node.
+
+    Each RPC request is bounded by `RPC_TIMEOUT` seconds (default 5)
+    """
     config = Config(".env")
-    rpc_url = config("RPC_NODE_URL", cast=str)
-    contract = config("SERVICE_CONTRACT_ADDRESS", cast=str)
-    if len(contract) == 0:
-        raise Exception("Config file missing service contract address!")
+    timeout = config("RPC_TIMEOUT", cast=float, default=5.0)
+    return Web3(Web3.HTTPProvider(rpc_url, request_kwargs={"timeout": timeout}))
 
-    w3 = Web3(Web3.HTTPProvider(rpc_url))
 
-    assert w3.is_connected()
+@lru_cache(maxsize=None)
+def get_registry(rpc_url: str, contract: str):
+    """
+    Return the ServiceRegistry contract at the given address, shared like the connection
+    """
+    w3 = get_web3(rpc_url)
+    return w3.eth.contract(address=contract, abi=json.loads(ABI))
 
-    abi = json.loads(ABI)
-    registry = w3.eth.contract(address=contract, abi=abi)
+
+def is_authorized_user(user: str, contract: str = None, rpc_url: str = None) -> bool:
+    """
+    Check the ServiceRegistry contract for the user. The contract and node
+    default to the values in the `.env` file.
+    """
+    config = Config(".env")
+    if rpc_url is None:
+        rpc_url = config("RPC_NODE_URL", cast=str)
+    if contract is None:
+        contract = config("SERVICE_CONTRACT_ADDRESS", cast=str)
+    if len(contract) == 0:
+        raise Exception("Config file missing service contract address!")
+
+    registry = get_registry(rpc_url, contract)
     result = registry.functions.isValidUser(user).call()
     return result
 
 
+def latest_block(rpc_url: str) -> int:
+    return get_web3(rpc_url).eth.block_number
+
+
+def registry_events(contract: str, rpc_url: str, from_block: int, to_block: int):
+    """
+    Return the Register and Removed events of the ServiceRegistry contract
+    between the given blocks (inclusive), in the order they happened.
+    """
+    registry = get_registry(rpc_url, contract)
+    registered = registry.events.Register.get_logs(
+        fromBlock=from_block, toBlock=to_block
+    )
+    removed = registry.events.Removed.get_logs(fromBlock=from_block, toBlock=to_block)
+    return sorted(
+        list(registered) + list(removed),
+        key=lambda e: (e["blockNumber"], e["logIndex"]),
+    )
+
+
+def authorized_users(contract: str = None, rpc_url: str = None):
+    """
+    Read the set of users authorized by the ServiceRegistry contract by replaying
+    its Register and Removed events.
+
+    Returns a tuple of (set of user addresses, block number read at)
+    """
+    config = Config(".env")
+    if rpc_url is None:
+        rpc_url = config("RPC_NODE_URL", cast=str)
+    if contract is None:
+        contract = config("SERVICE_CONTRACT_ADDRESS", cast=str)
+    if len(contract) == 0:
+        raise Exception("Config file missing service contract address!")
+
+    block = latest_block(rpc_url)
+    users = set()
+    for event in registry_events(contract, rpc_url, 0, block):
+        if event["event"] == "Register":
+            users.add(event["args"]["to"])
+        else:
+            users.discard(event["args"]["to"])
+    return (users, block)
+
+
 def setup_web3():
     config = Config(".env")
     rpc_url = config("RPC_NODE_URL", cast=str)
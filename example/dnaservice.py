@@ -1,15 +1,46 @@
 """
 Example of a service endpoint that integrates with the bionet guard for authentication/authorization
 """
-import httpx
+import os
+import time
 from fastapi import FastAPI, HTTPException, Header
-from bionet.types import ChallengeRequest, SignedMessage
+from fastapi.responses import JSONResponse
+from bionet.api import guard_client, max_age
+from bionet.types import ChallengeRequest, SignedMessage, RefreshRequest
 
 app = FastAPI()
 
+# Set GUARD_UDS to the guard's socket (bionet guard --uds ...) to skip TCP
+guard = guard_client(uds=os.environ.get("GUARD_UDS"))
+
+
+# login parameters from the guard are the same for every client, cache them
+_login_params = {"expires": 0}
+
 
 def _endpoint(path: str) -> str:
-    return f"http://localhost:5000/{path}"
+    return f"/{path}"
+
+
+@app.get("/login")
+async def login_params():
+    """
+    Parameters for clients to build the SIWE message themselves.
+    Clients may cache them for as long as this service does
+    """
+    if _login_params["expires"] <= time.time():
+        response = await guard.get(_endpoint("authenticate/params"))
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=400, detail="authenticate: login parameters error"
+            )
+        _login_params["params"] = response.json()
+        _login_params["expires"] = time.time() + max_age(response)
+    seconds_left = max(0, int(_login_params["expires"] - time.time()))
+    return JSONResponse(
+        _login_params["params"],
+        headers={"Cache-Control": f"max-age={seconds_left}"},
+    )
 
 
 @app.post("/login")
@@ -20,7 +51,7 @@ async def login(req: ChallengeRequest | SignedMessage):
     # Check which message is being sent...
     if isinstance(req, ChallengeRequest):
         try:
-            response = httpx.post(
+            response = await guard.post(
                 _endpoint("authenticate/request"), json=req.model_dump()
             )
             return response.json()
@@ -31,7 +62,7 @@ async def login(req: ChallengeRequest | SignedMessage):
             )
     elif isinstance(req, SignedMessage):
         try:
-            response = httpx.post(
+            response = await guard.post(
                 _endpoint("authenticate/verify"), json=req.model_dump()
             )
             return response.json()
@@ -46,12 +77,23 @@ async def login(req: ChallengeRequest | SignedMessage):
         )
 
 
+@app.post("/refresh")
+async def refresh(req: RefreshRequest):
+    """
+    Forward the refresh token to the guard for a new token
+    """
+    response = await guard.post(_endpoint("token/refresh"), json=req.model_dump())
+    if response.status_code != 200:
+        raise HTTPException(status_code=401, detail="authenticate: refresh failed")
+    return response.json()
+
+
 @app.post("/dna")
 async def dna_data(bearer: str | None = Header(default=None)):
     if not bearer:
         raise HTTPException(status_code=401, detail="Please login...")
     url = _endpoint(f"token/verify/{bearer}")
-    resp = httpx.get(url)
+    resp = await guard.get(url)
     if resp.status_code != 200:
         raise HTTPException(
             status_code=401, detail=f"authenticate: token verification failed"
@@ -2,7 +2,7 @@
 Alice is a client of Bob's Service
 """
 import httpx
-from bionet.api import authenticate
+from bionet.api import Session
 
 ALICE_ADDRESS = "0x23618e81E3f5cdF7f54C3d65f7FBc0aBf5B21E8f"
 ALICE_SECRET_KEY = "0xdbda1821b80551c9d65939329250298aa3472ba22feea921c0cf5d620ea67b97"
@@ -14,9 +14,14 @@ def can_access_service():
     HTTP calls to the service.   This will fail if Alice is not a registered user of the
     service.
     """
-    token = authenticate("http://localhost:8080/login", ALICE_SECRET_KEY)
+    session = Session(
+        "http://localhost:8080/login",
+        ALICE_SECRET_KEY,
+        refresh_url="http://localhost:8080/refresh",
+        one_round_trip=True,
+    )
 
-    result = httpx.post("http://localhost:8080/dna", headers={"Bearer": token})
+    result = httpx.post("http://localhost:8080/dna", headers={"Bearer": session.token})
 
     if result.status_code == 200:
         return True
@@ -4,3 +4,4 @@ environ["TEST_CLIENT_ADDRESS"] = "0x6281f977BC5f7FaA2dFd0905173FbecB382CECb3"
 environ[
     "TEST_CLIENT_SK"
 ] = "0xae4d758fc056d9b50a393c309a103847f6f78e3852f7ed15be508ae3923f0e32"
+environ["REFRESH_TOKEN_EXPIRATION"] = "24"
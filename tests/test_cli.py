@@ -0,0 +1,96 @@
+"""
+Import-time regression tests for the CLI.
+
+Each command is run in a fresh interpreter with `-X importtime`. The test checks
+the command does not pull in heavy modules it doesn't use and stays within its
+import budget.
+
+Import times vary a lot between machines, so budgets are relative to the time
+of a bare `import click` measured in the same run. Set `IMPORT_BUDGET=0` to skip
+the timing check, the heavy module check always runs.
+"""
+import os
+import sys
+import subprocess
+from functools import lru_cache
+
+import pytest
+
+# Budgets are the total self time of all imports, as a multiple of `import click`
+IMPORT_BUDGET = {
+    "--help": 2,
+    "guard --help": 2,
+    "deploy --help": 2,
+    "register --help": 2,
+    "is-valid --help": 2,
+    "remove --help": 2,
+    "snapshot --help": 2,
+    "wallet": 20,
+}
+
+HEAVY_MODULES = {"web3", "uvicorn", "fastapi", "bionet.w3", "bionet.server"}
+
+
+def _import_profile(args: str):
+    """Run the cli with the given args, returning (imported modules, total ms)"""
+    return _profile(f"from bionet.cli import cli; cli({args.split()!r})")
+
+
+@lru_cache(maxsize=None)
+def _baseline_ms():
+    """Total import time of click alone, the least any command can take"""
+    return _profile("import click")[1]
+
+
+def _profile(code: str):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+    modules = set()
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        modules.add(name.strip())
+        total_us += int(self_us)
+    return modules, total_us / 1000
+
+
+@pytest.mark.parametrize("args", IMPORT_BUDGET.keys())
+def test_command_imports(args):
+    modules, total_ms = _import_profile(args)
+
+    assert "bionet.cli" in modules
+    assert not HEAVY_MODULES & modules
+    if os.environ.get("IMPORT_BUDGET", "1") != "0":
+        assert total_ms < IMPORT_BUDGET[args] * _baseline_ms()
+
+
+def test_unix_socket_permissions(tmp_path):
+    import os
+    import stat
+    from bionet.cli import _bind_unix_socket
+
+    path = str(tmp_path / "guard.sock")
+    sock = _bind_unix_socket(path, 0o600)
+    try:
+        mode = os.stat(path).st_mode
+        assert stat.S_ISSOCK(mode)
+        assert stat.S_IMODE(mode) == 0o600
+    finally:
+        sock.close()
+
+
+def test_unix_socket_keeps_other_files(tmp_path):
+    from bionet.cli import _bind_unix_socket
+
+    path = tmp_path / "guard.sock"
+    path.write_text("not a socket")
+    with pytest.raises(Exception, match="not a socket"):
+        _bind_unix_socket(str(path), 0o600)
+    assert path.read_text() == "not a socket"
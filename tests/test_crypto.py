@@ -0,0 +1,124 @@
+import os
+import signal
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from eth_account import Account
+
+from bionet.types import Token
+from bionet.crypto import CryptoPool, token_sign, token_verify
+
+
+def _tokens(count: int):
+    issuer = Account.create()
+    tokens = []
+    for _ in range(count):
+        token = Token.create(Account.create().address, "example.com", 1)
+        tokens.append(token.sign(issuer.key.hex()))
+    return tokens
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_pool_verifies(workers):
+    async def run():
+        pool = CryptoPool(workers=workers, batch_size=4)
+        try:
+            tokens = _tokens(10)
+            payloads = await asyncio.gather(
+                *[pool.run(token_verify, t, "example.com") for t in tokens]
+            )
+            assert [p.jti for p in payloads] == [
+                Token.verify_payload(t, "example.com").jti for t in tokens
+            ]
+
+            with pytest.raises(Exception, match="domain"):
+                await pool.run(token_verify, tokens[0], "other.com")
+        finally:
+            pool.shutdown()
+
+    asyncio.run(run())
+
+
+def test_pool_signs():
+    async def run():
+        pool = CryptoPool(workers=1)
+        try:
+            issuer = Account.create()
+            token = Token.create(Account.create().address, "example.com", 1)
+            jwt = await pool.run(token_sign, token, issuer.key.hex())
+            assert Token.verify_payload(jwt, "example.com").iss == issuer.address
+        finally:
+            pool.shutdown()
+
+    asyncio.run(run())
+
+
+def test_pool_recovers_from_dead_worker():
+    async def run():
+        pool = CryptoPool(workers=1)
+        try:
+            issuer = Account.create()
+            token = Token.create(Account.create().address, "example.com", 1)
+            await pool.run(token_sign, token, issuer.key.hex())
+
+            for pid in list(pool._executor._processes):
+                os.kill(pid, signal.SIGKILL)
+
+            # calls caught by the dead pool fail instead of hanging
+            try:
+                await asyncio.wait_for(
+                    pool.run(token_sign, token, issuer.key.hex()), 30
+                )
+            except BrokenProcessPool:
+                pass
+
+            # and a new pool takes over
+            jwts = await asyncio.wait_for(
+                asyncio.gather(
+                    *[pool.run(token_sign, token, issuer.key.hex()) for _ in range(4)]
+                ),
+                30,
+            )
+            for jwt in jwts:
+                assert Token.verify_payload(jwt, "example.com").iss == issuer.address
+        finally:
+            pool.shutdown()
+
+    asyncio.run(run())
+
+
+def test_pool_fails_whole_batch_when_submit_fails():
+    async def run():
+        pool = CryptoPool(workers=1, batch_size=2)
+        try:
+            pool._executor = _BrokenExecutor()
+            token = Token.create(Account.create().address, "example.com", 1)
+            key = Account.create().key.hex()
+
+            # the second call fills the batch and flushes from inside run()
+            results = await asyncio.wait_for(
+                asyncio.gather(
+                    pool.run(token_sign, token, key),
+                    pool.run(token_sign, token, key),
+                    return_exceptions=True,
+                ),
+                30,
+            )
+            assert all(isinstance(r, BrokenProcessPool) for r in results)
+            assert pool._executor is None
+
+            jwt = await asyncio.wait_for(pool.run(token_sign, token, key), 30)
+            assert Token.verify_payload(jwt, "example.com").sub == token.sub
+        finally:
+            pool.shutdown()
+
+    asyncio.run(run())
+
+
+class _BrokenExecutor:
+    def submit(self, *args):
+        raise BrokenProcessPool("a worker died")
+
+    def shutdown(self, wait=True):
+        pass
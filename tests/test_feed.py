@@ -0,0 +1,58 @@
+import asyncio
+
+from bionet.feed import ChangeFeed
+
+
+async def _collect(feed: ChangeFeed, cursor, count: int):
+    events = []
+    async for event in feed.subscribe(cursor, keepalive=0.01):
+        if event is not None:
+            events.append(event)
+        if len(events) == count:
+            return events
+
+
+def test_resume_from_cursor():
+    async def run():
+        feed = ChangeFeed()
+        first = feed.publish("registered", {"address": "0x1"})
+        feed.publish("removed", {"address": "0x1"})
+        feed.publish("revoked", {"address": "0x2", "jti": "abc"})
+
+        events = await _collect(feed, first, 2)
+        assert [kind for _, kind, _ in events] == ["removed", "revoked"]
+
+    asyncio.run(run())
+
+
+def test_live_events():
+    async def run():
+        feed = ChangeFeed()
+        feed.publish("registered", {"address": "0x1"})
+
+        # no cursor starts at the head
+        task = asyncio.create_task(_collect(feed, None, 1))
+        await asyncio.sleep(0.01)
+        event_id = feed.publish("removed", {"address": "0x1"})
+        events = await task
+        assert events == [(event_id, "removed", {"address": "0x1"})]
+
+    asyncio.run(run())
+
+
+def test_reset_on_unknown_cursor():
+    async def run():
+        feed = ChangeFeed(size=2)
+        first = feed.publish("registered", {"address": "0x1"})
+        for _ in range(3):
+            feed.publish("registered", {"address": "0x2"})
+
+        # cursor has been dropped from the feed
+        events = await _collect(feed, first, 1)
+        assert events[0][1] == "reset"
+
+        # cursor from a previous guard process
+        events = await _collect(feed, "deadbeef-1", 1)
+        assert events[0][1] == "reset"
+
+    asyncio.run(run())
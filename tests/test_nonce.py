@@ -0,0 +1,32 @@
+import pytest
+
+from bionet.nonce import nonce_key, make_nonce, nonce_expires, check_nonce
+
+KEY = nonce_key("0xsecret")
+DOMAIN = "example.com"
+
+
+def test_nonce_accepted_for_two_buckets():
+    nonce = make_nonce(KEY, DOMAIN, 60, now=6000)
+    assert nonce.isalnum() and len(nonce) >= 8
+    assert make_nonce(KEY, DOMAIN, 60, now=6059) == nonce
+    assert nonce_expires(nonce, 60) == 6120
+
+    check_nonce(KEY, nonce, DOMAIN, 60, now=6000)
+    check_nonce(KEY, nonce, DOMAIN, 60, now=6119)
+    with pytest.raises(Exception, match="expired"):
+        check_nonce(KEY, nonce, DOMAIN, 60, now=6120)
+
+
+def test_nonce_forged():
+    nonce = make_nonce(KEY, DOMAIN, 60, now=6000)
+
+    with pytest.raises(Exception):
+        check_nonce(nonce_key("0xother"), nonce, DOMAIN, 60, now=6000)
+    with pytest.raises(Exception):
+        check_nonce(KEY, nonce, "other.com", 60, now=6000)
+    with pytest.raises(Exception):
+        # moving the nonce to a later bucket
+        check_nonce(KEY, nonce[:16] + "65", DOMAIN, 60, now=6060)
+    with pytest.raises(Exception):
+        check_nonce(KEY, "abcdefghijkl", DOMAIN, 60, now=6000)
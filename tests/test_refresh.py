@@ -0,0 +1,60 @@
+import pytest
+
+from bionet.refresh import RefreshTokens, RefreshTokenReuse
+
+ADDRESS = "0x6281f977BC5f7FaA2dFd0905173FbecB382CECb3"
+
+
+def test_rotation():
+    tokens = RefreshTokens()
+    first = tokens.issue(ADDRESS, 1)
+
+    address, second = tokens.rotate(first)
+    assert address == ADDRESS
+    assert second != first
+
+    address, third = tokens.rotate(second)
+    assert address == ADDRESS
+
+
+def test_reuse_revokes_family():
+    tokens = RefreshTokens()
+    first = tokens.issue(ADDRESS, 1)
+    tokens.record_access_token(first, "jti-1", 100)
+    _, second = tokens.rotate(first)
+    tokens.record_access_token(second, "jti-2", 200)
+
+    with pytest.raises(RefreshTokenReuse) as e:
+        tokens.rotate(first)
+    assert e.value.address == ADDRESS
+    assert e.value.issued == [("jti-1", 100), ("jti-2", 200)]
+
+    # the current token of the family is revoked too
+    with pytest.raises(Exception):
+        tokens.rotate(second)
+
+
+def test_revoke_retires_family():
+    tokens = RefreshTokens()
+    first = tokens.issue(ADDRESS, 1)
+    tokens.record_access_token(first, "jti-1", 100)
+    _, second = tokens.rotate(first)
+    tokens.record_access_token(second, "jti-2", 200)
+
+    assert tokens.revoke("jti-2") == [("jti-1", 100), ("jti-2", 200)]
+    with pytest.raises(Exception, match="Unknown"):
+        tokens.rotate(second)
+
+    # already retired, or never issued with a refresh token
+    assert tokens.revoke("jti-1") == []
+    assert tokens.revoke("other") == []
+
+
+def test_unknown_and_expired():
+    tokens = RefreshTokens()
+    with pytest.raises(Exception):
+        tokens.rotate("nope")
+
+    expired = tokens.issue(ADDRESS, -1)
+    with pytest.raises(Exception):
+        tokens.rotate(expired)
@@ -0,0 +1,139 @@
+import time
+
+import pytest
+from eth_account import Account
+from web3.exceptions import ContractLogicError
+from requests.exceptions import ConnectionError
+from starlette.datastructures import Secret
+
+from bionet import registry
+from bionet.tenants import Tenant
+from bionet.registry import CircuitBreaker, RegistryCache
+
+
+def test_breaker_opens_and_probes():
+    breaker = CircuitBreaker(threshold=2, reset_after=0.05)
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == "closed"
+    breaker.failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    # a single probe is let through
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # failed probe re-opens
+    breaker.failure()
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_cache_disabled():
+    cache = RegistryCache()
+    calls = []
+    cache.lookup("c", "0xA", lambda: calls.append(1) or True)
+    cache.lookup("c", "0xA", lambda: calls.append(1) or True)
+    assert len(calls) == 2
+
+
+def test_cache_serves_stale_and_refreshes():
+    cache = RegistryCache(ttl=0.02, grace=10)
+    assert cache.lookup("c", "0xA", lambda: True)
+
+    # fresh
+    assert cache.lookup("c", "0xa", lambda: pytest.fail("should be cached"))
+
+    # stale: old result returned, new one fetched in the background
+    time.sleep(0.03)
+    assert cache.lookup("c", "0xA", lambda: False)
+    cache._executor.shutdown(wait=True)
+
+    # the user was removed, that isn't cached
+    calls = []
+    assert not cache.lookup("c", "0xA", lambda: calls.append(1) or False)
+    assert len(calls) == 1
+
+
+def test_cache_skips_unauthorized():
+    cache = RegistryCache(ttl=10)
+    assert cache.lookup("c", "0xA", lambda: False) is False
+    # registered since, accepted without waiting for the ttl
+    assert cache.lookup("c", "0xA", lambda: True) is True
+    assert cache.lookup("c", "0xA", lambda: pytest.fail("should be cached"))
+
+
+def test_cache_expires_after_grace():
+    cache = RegistryCache(ttl=0.01, grace=0.01)
+    assert cache.lookup("c", "0xA", lambda: True)
+    time.sleep(0.03)
+
+    def unavailable():
+        raise Exception("node down")
+
+    with pytest.raises(Exception):
+        cache.lookup("c", "0xA", unavailable)
+
+
+def test_cache_limit_per_contract():
+    cache = RegistryCache(ttl=10, size=2)
+    for user in ["0x1", "0x2", "0x3"]:
+        cache.lookup("busy", user, lambda: True)
+    cache.lookup("quiet", "0x1", lambda: True)
+
+    # oldest entry of the busy contract was evicted, the other contract kept its own
+    assert cache.lookup("busy", "0x1", lambda: False) is False
+    assert cache.lookup("quiet", "0x1", lambda: False) is True
+
+
+def test_cache_invalidate():
+    cache = RegistryCache(ttl=10)
+    cache.lookup("c", "0xA", lambda: True)
+    cache.invalidate("c", "0xa")
+    assert cache.lookup("c", "0xA", lambda: False) is False
+
+
+def _tenant(contract: str, rpc_url: str) -> Tenant:
+    return Tenant(
+        name=contract or "unconfigured",
+        domain="example.com",
+        login_url="https://example.com/login",
+        secret_key=Secret(Account.create().key.hex()),
+        contract_address=contract,
+        rpc_url=rpc_url,
+        chain_id=1,
+        version="1",
+        challenge_expiration=60,
+        token_expiration=1,
+    )
+
+
+def test_breaker_counts_node_errors_only(monkeypatch):
+    def is_authorized_user(user, contract, rpc_url):
+        if contract == "reverts":
+            raise ContractLogicError("execution reverted")
+        raise ConnectionError("connection refused")
+
+    monkeypatch.setattr(registry, "is_authorized_user", is_authorized_user)
+    rpc_url = "http://shared-node.invalid"
+    node = registry.breaker(rpc_url)
+
+    # tenants with bad settings don't open the breaker for the others
+    for _ in range(node.threshold + 1):
+        with pytest.raises(Exception, match="No service contract"):
+            registry.is_registered(_tenant("", rpc_url), "0xA")
+        with pytest.raises(ContractLogicError):
+            registry.is_registered(_tenant("reverts", rpc_url), "0xA")
+    assert node.state == "closed"
+
+    for _ in range(node.threshold):
+        with pytest.raises(ConnectionError):
+            registry.is_registered(_tenant("0x1", rpc_url), "0xA")
+    assert node.state == "open"
@@ -3,6 +3,7 @@ import pytest
 
 from siwe import SiweMessage
 from eth_account import Account
+from fastapi.responses import JSONResponse
 from fastapi.testclient import TestClient
 from eth_account.messages import encode_defunct
 from bionet.types import AuthenticationResult, ChallengeRequest
@@ -12,8 +13,9 @@ from bionet.types import AuthenticationResult, ChallengeRequest
 def client():
     from bionet.server import app
 
-    client = TestClient(app)
-    return client
+    # the context manager runs the startup event that loads the tenants
+    with TestClient(app) as client:
+        yield client
 
 
 def test_good_challenge_request(client: TestClient):
@@ -59,6 +61,39 @@ def test_good_authetication(client: TestClient):
     assert account.address == result.address
     assert len(result.token) > 0
 
+    # same bytes FastAPI would produce from the model
+    assert response.content == JSONResponse(result.model_dump()).body
+
+
+def test_authentication_in_worker_pool(client: TestClient, monkeypatch):
+    from bionet import server
+    from bionet.crypto import CryptoPool
+
+    # what is sent to the workers has to survive pickling
+    pool = CryptoPool(workers=1)
+    monkeypatch.setattr(server, "crypto", pool)
+    try:
+        sk = os.environ["TEST_CLIENT_SK"]
+        account = Account.from_key(sk)
+
+        response = client.post(
+            "/authenticate/request", json={"address": account.address}
+        )
+        raw = SiweMessage(response.json()["message"]).prepare_message()
+        sig = account.sign_message(encode_defunct(text=raw))
+        response = client.post(
+            "/authenticate/verify",
+            json={"message": raw, "signature": sig.signature.hex()},
+        )
+        assert response.status_code == 200, response.text
+        result = AuthenticationResult.from_json(response.json())
+        assert result.address == account.address
+
+        response = client.post(f"/token/revoke/{result.token}")
+        assert response.status_code == 200
+    finally:
+        pool.shutdown()
+
 
 def test_bad_authetication(client: TestClient):
     response = client.post(
@@ -94,3 +129,158 @@ def test_good_token(client: TestClient):
     assert response.status_code == 200
     result = AuthenticationResult.from_json(response.json())
     assert account.address == result.address
+
+
+def test_revoked_token(client: TestClient):
+    sk = os.environ["TEST_CLIENT_SK"]
+    account = Account.from_key(sk)
+
+    response = client.post("/authenticate/request", json={"address": account.address})
+    msg = SiweMessage(response.json()["message"])
+    raw = msg.prepare_message()
+    sig = account.sign_message(encode_defunct(text=raw))
+    response = client.post(
+        "/authenticate/verify", json={"message": raw, "signature": sig.signature.hex()}
+    )
+    token = AuthenticationResult.from_json(response.json()).token
+
+    response = client.post(f"/token/revoke/{token}")
+    assert response.status_code == 200
+    assert response.json()["address"] == account.address
+
+    response = client.get(f"/token/verify/{token}")
+    assert response.status_code == 400
+    assert "revoked" in response.json()["detail"]
+
+
+def test_registry_unavailable(client: TestClient, monkeypatch):
+    from requests.exceptions import ConnectionError
+    from bionet import registry
+
+    # whether or not a local node is running, this one can't be reached
+    def unreachable(user, contract, rpc_url):
+        raise ConnectionError("connection refused")
+
+    monkeypatch.setattr(registry, "is_authorized_user", unreachable)
+
+    sk = os.environ["TEST_CLIENT_SK"]
+    account = Account.from_key(sk)
+
+    response = client.post("/authenticate/request", json={"address": account.address})
+    msg = SiweMessage(response.json()["message"])
+    raw = msg.prepare_message()
+    sig = account.sign_message(encode_defunct(text=raw))
+    response = client.post(
+        "/authenticate/verify", json={"message": raw, "signature": sig.signature.hex()}
+    )
+    token = AuthenticationResult.from_json(response.json()).token
+
+    response = client.get(f"/token/verify/{token}")
+    assert response.status_code == 503
+
+    response = client.get("/registry/status")
+    assert response.status_code == 200
+    assert response.json()["counters"]["rpc_errors"] > 0
+
+
+def test_refresh_token(client: TestClient):
+    sk = os.environ["TEST_CLIENT_SK"]
+    account = Account.from_key(sk)
+
+    response = client.post("/authenticate/request", json={"address": account.address})
+    msg = SiweMessage(response.json()["message"])
+    raw = msg.prepare_message()
+    sig = account.sign_message(encode_defunct(text=raw))
+    response = client.post(
+        "/authenticate/verify", json={"message": raw, "signature": sig.signature.hex()}
+    )
+    first = AuthenticationResult.from_json(response.json())
+    assert first.refresh_token
+
+    response = client.post(
+        "/token/refresh", json={"refresh_token": first.refresh_token}
+    )
+    assert response.status_code == 200
+    second = AuthenticationResult.from_json(response.json())
+    assert second.address == account.address
+    assert second.token != first.token
+    assert second.refresh_token != first.refresh_token
+
+    # reusing the first refresh token revokes everything issued from the login
+    response = client.post(
+        "/token/refresh", json={"refresh_token": first.refresh_token}
+    )
+    assert response.status_code == 400
+    response = client.post(
+        "/token/refresh", json={"refresh_token": second.refresh_token}
+    )
+    assert response.status_code == 400
+    response = client.get(f"/token/verify/{second.token}")
+    assert response.status_code == 400
+    assert "revoked" in response.json()["detail"]
+
+
+def test_refresh_after_logout(client: TestClient):
+    sk = os.environ["TEST_CLIENT_SK"]
+    account = Account.from_key(sk)
+
+    response = client.post("/authenticate/request", json={"address": account.address})
+    msg = SiweMessage(response.json()["message"])
+    raw = msg.prepare_message()
+    sig = account.sign_message(encode_defunct(text=raw))
+    response = client.post(
+        "/authenticate/verify", json={"message": raw, "signature": sig.signature.hex()}
+    )
+    first = AuthenticationResult.from_json(response.json())
+    response = client.post(
+        "/token/refresh", json={"refresh_token": first.refresh_token}
+    )
+    second = AuthenticationResult.from_json(response.json())
+
+    # logging out with the latest token ends the refresh token too
+    response = client.post(f"/token/revoke/{second.token}")
+    assert response.status_code == 200
+    response = client.post(
+        "/token/refresh", json={"refresh_token": second.refresh_token}
+    )
+    assert response.status_code == 400
+
+    # and revokes the other access tokens from the login
+    response = client.get(f"/token/verify/{first.token}")
+    assert response.status_code == 400
+    assert "revoked" in response.json()["detail"]
+
+
+def test_one_round_trip_login(client: TestClient):
+    from bionet.api import _login_once
+
+    sk = os.environ["TEST_CLIENT_SK"]
+    account = Account.from_key(sk)
+
+    response = client.get("/authenticate/params")
+    assert response.status_code == 200
+    assert response.headers["cache-control"].startswith("max-age=")
+    params = response.json()
+
+    result = _login_once(client, "/authenticate/verify", account, params)
+    assert result.address == account.address
+    assert len(result.token) > 0
+
+    # a nonce the guard didn't make is rejected
+    params["nonce"] = "abcdefghijkl"
+    with pytest.raises(Exception):
+        _login_once(client, "/authenticate/verify", account, params)
+
+    # before the signature is looked at
+    message = SiweMessage(
+        message={
+            **params,
+            "address": account.address,
+            "issued_at": "2024-01-01T00:00:00Z",
+        }
+    ).prepare_message()
+    response = client.post(
+        "/authenticate/verify", json={"message": message, "signature": "0x00"}
+    )
+    assert response.status_code == 400
+    assert "Invalid nonce" in response.json()["detail"]
@@ -0,0 +1,110 @@
+import os
+
+import pytest
+from eth_account import Account
+
+from bionet.snapshot import Snapshot, SnapshotRegistry, write_snapshot
+
+CONTRACT = "0x5FbDB2315678afecb367f032d93F642f64180aa3"
+
+
+def test_snapshot_lookup(tmp_path):
+    issuer = Account.create()
+    users = [Account.create().address for _ in range(50)]
+    path = str(tmp_path / "registry.snapshot")
+
+    write_snapshot(path, users, 42, CONTRACT, issuer.key.hex())
+    snapshot = Snapshot(path, issuer.address, CONTRACT)
+
+    assert len(snapshot) == 50
+    assert snapshot.block_number == 42
+    assert snapshot.contract == CONTRACT
+    for user in users:
+        assert user in snapshot
+        assert user.lower() in snapshot
+    assert Account.create().address not in snapshot
+
+
+def test_empty_snapshot(tmp_path):
+    issuer = Account.create()
+    path = str(tmp_path / "registry.snapshot")
+
+    write_snapshot(path, [], 1, CONTRACT, issuer.key.hex())
+    snapshot = Snapshot(path, issuer.address, CONTRACT)
+    assert Account.create().address not in snapshot
+
+
+def test_snapshot_wrong_issuer(tmp_path):
+    issuer = Account.create()
+    path = str(tmp_path / "registry.snapshot")
+    write_snapshot(path, [Account.create().address], 1, CONTRACT, issuer.key.hex())
+
+    with pytest.raises(BaseException):
+        Snapshot(path, Account.create().address, CONTRACT)
+
+
+def test_snapshot_tampered(tmp_path):
+    issuer = Account.create()
+    path = str(tmp_path / "registry.snapshot")
+    write_snapshot(path, [Account.create().address], 1, CONTRACT, issuer.key.hex())
+
+    with open(path, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b"\x00")
+
+    with pytest.raises(BaseException):
+        Snapshot(path, issuer.address, CONTRACT)
+
+
+def test_registry_hot_swap(tmp_path):
+    issuer = Account.create()
+    alice = Account.create().address
+    bob = Account.create().address
+    path = str(tmp_path / "registry.snapshot")
+
+    write_snapshot(path, [alice], 1, CONTRACT, issuer.key.hex())
+    registry = SnapshotRegistry(path, issuer.address, CONTRACT)
+    assert registry.is_valid_user(alice)
+    assert not registry.is_valid_user(bob)
+
+    write_snapshot(path, [bob], 2, CONTRACT, issuer.key.hex())
+    assert registry.is_valid_user(bob)
+    assert not registry.is_valid_user(alice)
+    assert registry.block_number == 2
+
+    # a snapshot from someone else is ignored
+    write_snapshot(path, [alice], 3, CONTRACT, Account.create().key.hex())
+    assert registry.is_valid_user(bob)
+    assert registry.block_number == 2
+
+
+def test_snapshot_wrong_contract(tmp_path):
+    issuer = Account.create()
+    path = str(tmp_path / "registry.snapshot")
+    write_snapshot(path, [Account.create().address], 1, CONTRACT, issuer.key.hex())
+
+    with pytest.raises(Exception, match="another registry contract"):
+        Snapshot(path, issuer.address, Account.create().address)
+
+
+def test_registry_rejects_rollback(tmp_path):
+    issuer = Account.create()
+    alice = Account.create().address
+    bob = Account.create().address
+    path = str(tmp_path / "registry.snapshot")
+
+    write_snapshot(path, [alice], 5, CONTRACT, issuer.key.hex())
+    registry = SnapshotRegistry(path, issuer.address, CONTRACT)
+
+    # an older, validly signed snapshot is not swapped in
+    write_snapshot(path, [bob], 4, CONTRACT, issuer.key.hex())
+    assert registry.is_valid_user(alice)
+    assert not registry.is_valid_user(bob)
+    assert registry.block_number == 5
+
+    # also when the current snapshot is empty
+    write_snapshot(path, [], 6, CONTRACT, issuer.key.hex())
+    assert not registry.is_valid_user(alice)
+    write_snapshot(path, [bob], 5, CONTRACT, issuer.key.hex())
+    assert not registry.is_valid_user(bob)
+    assert registry.block_number == 6
@@ -0,0 +1,87 @@
+import json
+
+from starlette.config import Config
+from eth_account import Account
+
+from bionet.tenants import load_tenants
+
+
+def _write_tenants(tmp_path):
+    entries = {
+        "dna": {
+            "host": "dna.example.com",
+            "login_url": "https://dna.example.com/login",
+            "domain": "dna.example.com",
+            "secret_key": Account.create().key.hex(),
+            "service_contract_address": "",
+        },
+        "rna": {
+            "host": "rna.example.com",
+            "login_url": "https://rna.example.com/login",
+            "domain": "rna.example.com",
+            "secret_key": Account.create().key.hex(),
+            "service_contract_address": "",
+            "token_expiration": 5,
+        },
+    }
+    tenants_file = tmp_path / "tenants.json"
+    tenants_file.write_text(json.dumps(entries))
+    return tenants_file
+
+
+def _config(**values) -> Config:
+    base = {
+        "CHAIN_ID": "1",
+        "VERSION": "1",
+        "CHALLENGE_EXPIRATION": "60",
+        "TOKEN_EXPIRATION": "1",
+    }
+    base.update(values)
+    return Config(environ=base)
+
+
+def test_resolve_by_name_and_host(tmp_path):
+    tenants = load_tenants(_config(TENANTS_FILE=str(_write_tenants(tmp_path))))
+
+    assert tenants.resolve("dna", None).domain == "dna.example.com"
+    assert tenants.resolve(None, "rna.example.com:8080").name == "rna"
+    assert tenants.resolve("nope", "dna.example.com") is None
+
+    # no default tenant when there are several
+    assert tenants.resolve(None, "other.example.com") is None
+
+
+def test_tenant_overrides_defaults(tmp_path):
+    tenants = load_tenants(_config(TENANTS_FILE=str(_write_tenants(tmp_path))))
+
+    assert tenants.by_name["dna"].token_expiration == 1
+    assert tenants.by_name["rna"].token_expiration == 5
+
+
+def test_default_tenant(tmp_path):
+    config = _config(
+        TENANTS_FILE=str(_write_tenants(tmp_path)),
+        DEFAULT_TENANT="dna",
+    )
+    tenants = load_tenants(config)
+    assert tenants.resolve(None, "other.example.com").name == "dna"
+
+
+def test_single_tenant_from_env():
+    config = _config(
+        LOGIN_URL="https://example.com/login",
+        DOMAIN="example.com",
+        SECRET_KEY=Account.create().key.hex(),
+    )
+    tenants = load_tenants(config)
+    assert tenants.resolve(None, "anything").domain == "example.com"
+
+
+def test_tenant_issuer():
+    issuer = Account.create()
+    config = _config(
+        LOGIN_URL="https://example.com/login",
+        DOMAIN="example.com",
+        SECRET_KEY=issuer.key.hex(),
+    )
+    assert load_tenants(config).default.issuer == issuer.address
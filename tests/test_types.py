@@ -18,6 +18,7 @@ def test_good_token():
 
     sub = Token.verify(jwt, "example.com")
     assert sub == subject.address
+    assert Token.decode(jwt) == token
 
 
 def test_token_bad_input():
@@ -66,3 +67,25 @@ def test_nbf_token():
 
     with pytest.raises(BaseException):
         Token.verify(jwt, "example.com")
+
+
+def test_token_encoding_unchanged():
+    """Tokens are byte for byte what the original json.dumps/asdict encoding produced"""
+    import json
+    import base64
+    from dataclasses import asdict
+    from eth_account.messages import encode_defunct
+
+    issuer = Account.create()
+    token = Token.create(Account.create().address, "exämple.com", 3)
+    jwt = token.sign(issuer.key.hex())
+
+    payload = json.dumps(asdict(token), separators=(",", ":"))
+    assert token.payload() == payload
+    header = json.dumps({"alg": "ES256", "typ": "JWT"}, separators=(",", ":"))
+    signature = issuer.sign_message(encode_defunct(text=payload)).signature.hex()
+    expected = ".".join(
+        base64.b64encode(v.encode("utf-8")).decode("utf-8")
+        for v in [header, payload, signature]
+    )
+    assert jwt == expected